@@ -0,0 +1,348 @@
+# Campus Library Manager - Benchmark suite
+#
+# Generates a synthetic catalog and loan history at a chosen scale and times
+# the interactive operations of library_manager_system with scripted input
+# and output sent to os.devnull. Results are written as JSON so runs from
+# different versions can be compared:
+#
+#   python library_benchmark.py --scale 10k 1M --output results.json
+#   python library_benchmark.py --scale 10k --compare results.json
+import argparse
+import builtins
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+from contextlib import redirect_stdout
+from datetime import datetime
+from itertools import accumulate
+
+import library_manager_system as library
+from library_store import STATUS_CODES
+
+BENCHMARK_VERSION = 1
+HISTORY_DAYS = 730  # loan history spans this many days up to today
+BOOKS_PER_TRANSACTION = 1 / 20
+STUDENTS_PER_TRANSACTION = 1 / 10
+BOOK_POPULARITY_SKEW = 1.1  # book at popularity rank r is borrowed in proportion to 1 / r ** skew
+STUDENT_ACTIVITY_SKEW = 0.8
+GENRES = ("Technology", "Computer Science", "Fiction", "History", "Biology", "Mathematics",
+          "Philosophy", "Economics", "Art", "Poetry", "Physics", "Law")
+TITLE_WORDS = ("Python", "Data", "Modern", "Introduction", "Advanced", "History", "Theory", "Practical",
+               "Systems", "Design", "Learning", "Networks", "Algorithms", "World", "Guide", "Science")
+FIRST_NAMES = ("Alice", "Bob", "Carol", "David", "Eve", "Frank", "Grace", "Heidi", "Ivan", "Judy",
+               "Mallory", "Niaj", "Olivia", "Peggy", "Rupert", "Sybil", "Trent", "Victor", "Wendy")
+LAST_NAMES = ("Johnson", "Brown", "Smith", "Doe", "Wilson", "Taylor", "Lee", "Garcia", "Martin", "Clark")
+
+# Generated IDs in popularity order, for picking realistic operation inputs
+generated = {"book_ids": [], "student_ids": []}
+
+
+def parse_scale(text):
+    """Parse a transaction count such as 10000, 10k or 1.5M"""
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if multiplier > 1 else text) * multiplier)
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def generate_library(transaction_count, seed=1):
+    """Replace the library's books and transactions with synthetic data; returns the scale figures
+
+    Book popularity and student activity follow power laws, and each
+    student has a lateness rate (most are rarely late, a few usually are),
+    which drives the fines and the share of open loans that are overdue.
+    """
+    rng = random.Random(seed)
+    today = library.get_current_day()
+    book_count = max(100, int(transaction_count * BOOKS_PER_TRANSACTION))
+    student_count = max(50, int(transaction_count * STUDENTS_PER_TRANSACTION))
+
+    book_ids = [f"B{number:0{len(str(book_count))}d}" for number in range(1, book_count + 1)]
+    student_ids = [f"S{number:0{len(str(student_count))}d}" for number in range(1, student_count + 1)]
+    student_names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in student_ids]
+    lateness = [rng.random() ** 3 for _ in student_ids]
+
+    # Popular titles get more copies
+    total_copies = [rng.randint(1, 5) + (10 if rank < book_count // 100 else 0) for rank in range(book_count)]
+    available = list(total_copies)
+    checkout_counts = [0] * book_count
+    student_loans = [0] * student_count
+
+    book_weights = list(accumulate(1 / (rank + 1) ** BOOK_POPULARITY_SKEW for rank in range(book_count)))
+    student_weights = list(accumulate(1 / (rank + 1) ** STUDENT_ACTIVITY_SKEW for rank in range(student_count)))
+    chosen_books = rng.choices(range(book_count), cum_weights=book_weights, k=transaction_count)
+    chosen_students = rng.choices(range(student_count), cum_weights=student_weights, k=transaction_count)
+
+    columns = {name: array(typecode) for name, typecode in (
+        ("book_column", "i"), ("student_column", "i"), ("name_column", "i"), ("checkout_column", "i"),
+        ("due_column", "i"), ("return_column", "i"), ("fine_column", "d"), ("status_column", "B"),
+        ("number_column", "q"))}
+    borrowed, returned = STATUS_CODES["borrowed"], STATUS_CODES["returned"]
+
+    for number in range(transaction_count):
+        book, student = chosen_books[number], chosen_students[number]
+        checkout_day = today - HISTORY_DAYS + number * HISTORY_DAYS // transaction_count
+        due_day = checkout_day + library.LOAN_PERIOD_DAYS
+        if rng.random() < lateness[student]:
+            return_day = due_day + rng.randint(1, 60)
+        else:
+            return_day = checkout_day + rng.randint(1, library.LOAN_PERIOD_DAYS)
+
+        still_out = (return_day >= today and available[book] > 0
+                     and student_loans[student] < library.MAX_BOOKS_PER_STUDENT)
+        if still_out:
+            available[book] -= 1
+            student_loans[student] += 1
+        return_day = min(return_day, today)
+        checkout_counts[book] += 1
+
+        columns["book_column"].append(book)
+        columns["student_column"].append(student)
+        columns["name_column"].append(student)
+        columns["checkout_column"].append(checkout_day)
+        columns["due_column"].append(due_day)
+        columns["return_column"].append(-1 if still_out else return_day)
+        columns["fine_column"].append(0.0 if still_out else max(0, return_day - due_day) * library.FINE_PER_DAY)
+        columns["status_column"].append(borrowed if still_out else returned)
+        columns["number_column"].append(number + 1)
+
+    library.books.clear()
+    for rank, book_id in enumerate(book_ids):
+        library.books[book_id] = {
+            "title": " ".join(rng.sample(TITLE_WORDS, 3)) + f" {rank}",
+            "author": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "genre": GENRES[rank % len(GENRES)],
+            "total_copies": total_copies[rank],
+            "available_copies": available[rank],
+            "checkout_count": checkout_counts[rank],
+            "publication_year": rng.randint(1950, 2024)
+        }
+    library.transactions.load_columns(columns, {"book_ids": book_ids, "student_ids": student_ids,
+                                                "student_names": student_names}, {})
+    library.archive_state.update(archived_before=0, transactions=0, fines=0.0, students={})
+    library.rebuild_indexes()
+    library.id_allocator.update(next_id=transaction_count + 1, reserved_until=0, loaded=True)
+    generated.update(book_ids=book_ids, student_ids=student_ids)
+
+    return {
+        "transactions": transaction_count,
+        "books": book_count,
+        "students": student_count,
+        "active_loans": len(library.loans_by_due_date),
+        "overdue_loans": library.count_overdue_loans(today)
+    }
+
+# =============================================================================
+# OPERATIONS
+# =============================================================================
+
+def random_book(rng, available_only=False):
+    """Pick a book ID, favouring popular titles"""
+    book_ids = generated["book_ids"]
+    while True:
+        book_id = book_ids[min(int(rng.paretovariate(1.0)) - 1, len(book_ids) - 1)]
+        if not available_only or library.books[book_id]['available_copies'] > 0:
+            return book_id
+
+def checkout_answers(rng):
+    """Input for a checkout that will succeed"""
+    while True:
+        student_id = rng.choice(generated["student_ids"])
+        if library.get_student_active_loans(student_id) < library.MAX_BOOKS_PER_STUDENT:
+            return [student_id, "Benchmark Student", random_book(rng, available_only=True)]
+
+def return_answers(rng):
+    """Input returning a random open loan"""
+    _, transaction_id = library.loans_by_due_date[rng.randrange(len(library.loans_by_due_date))]
+    return [transaction_id]
+
+def search_answers(rng, choice):
+    """Input for a title (1), author (2), genre (3) or multi-field (4) search"""
+    book = library.books[random_book(rng)]
+    if choice == 4:
+        return ["4", book['title'].split()[0], book['author'].split()[-1], ""]
+    term = book[library.SEARCH_FIELDS[choice - 1]]
+    return [str(choice), term.split()[rng.randrange(len(term.split()))].lower()]
+
+def add_book_answers(rng):
+    """Input adding a new book"""
+    add_book_answers.count = getattr(add_book_answers, "count", 0) + 1
+    return [f"BENCH{add_book_answers.count}", "Benchmark Book", "Bench Author", "Fiction", "3", "2024"]
+
+def update_book_answers(rng):
+    """Input changing a book's title and copies"""
+    book_id = random_book(rng)
+    book = library.books[book_id]
+    return [book_id, book['title'] + " (Revised)", "", "", str(book['total_copies'] + 1), ""]
+
+def first_page(rng):
+    """Input stopping a paged listing after its first page"""
+    return ["q"]
+
+OPERATIONS = (
+    ("add_book", library.add_book, add_book_answers),
+    ("update_book", library.update_book, update_book_answers),
+    ("display_all_books", library.display_all_books, first_page),
+    ("search_books_title", library.search_books, lambda rng: search_answers(rng, 1)),
+    ("search_books_author", library.search_books, lambda rng: search_answers(rng, 2)),
+    ("search_books_genre", library.search_books, lambda rng: search_answers(rng, 3)),
+    ("search_books_multi_field", library.search_books, lambda rng: search_answers(rng, 4)),
+    ("checkout_book", library.checkout_book, checkout_answers),
+    ("return_book", library.return_book, return_answers),
+    ("view_student_loans", library.view_student_loans,
+     lambda rng: [library.transactions[return_answers(rng)[0]]['student_id']]),
+    ("view_overdue_books", library.view_overdue_books, first_page),
+    ("inventory_report", library.inventory_report, first_page),
+    ("popular_books_report", library.popular_books_report, None),
+    ("popular_books_by_genre", lambda: library.popular_books_report(GENRES[0]), None),
+    ("transaction_summary", library.transaction_summary, None),
+    ("student_activity_report", library.student_activity_report, first_page),
+    ("student_ranking_report", library.student_ranking_report, lambda rng: ["total_fines", "y", "q"]),
+    ("fine_assessment_report", library.fine_assessment_report, None),
+    ("return_history_report", library.return_history_report, lambda rng: ["", ""]),
+    ("end_of_term_report", library.end_of_term_report, first_page),
+    ("display_system_status", library.display_system_status, None),
+)
+
+def time_operation(function, answers, runs, rng, output):
+    """Time runs of one operation; returns summary statistics in milliseconds"""
+    timings = []
+    original_input = builtins.input
+    try:
+        for _ in range(runs):
+            scripted = iter(answers(rng) if answers else ())
+            builtins.input = lambda prompt="": next(scripted)
+            # Start every run with an empty report cache, so reports are timed building rather than as cache hits
+            with library.shared_lock:
+                library.data_changed()
+            with redirect_stdout(output):
+                start = time.perf_counter()
+                function()
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        builtins.input = original_input
+
+    timings.sort()
+    return {
+        "runs": runs,
+        "min_ms": round(timings[0], 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4),
+        "max_ms": round(timings[-1], 4),
+        "mean_ms": round(statistics.fmean(timings), 4)
+    }
+
+def run_benchmark(transaction_count, runs=20, seed=1, only=None):
+    """Generate data at one scale and time every operation"""
+    start = time.perf_counter()
+    scale = generate_library(transaction_count, seed)
+    setup_seconds = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    results = {}
+    with open(os.devnull, "w") as output:
+        for name, function, answers in OPERATIONS:
+            if only and name not in only:
+                continue
+            results[name] = time_operation(function, answers, runs, rng, output)
+            print(f"  {name:<28} median {results[name]['median_ms']:>10.3f} ms   "
+                  f"p95 {results[name]['p95_ms']:>10.3f} ms")
+    return {"scale": scale, "setup_seconds": round(setup_seconds, 3), "operations": results}
+
+# =============================================================================
+# RESULTS
+# =============================================================================
+
+def environment():
+    """Describe the machine and code version the results came from"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": library.np is not None
+    }
+
+def compare_results(previous, current, max_slowdown):
+    """Print median changes against earlier results; returns the operations that slowed down too much"""
+    regressions = []
+    earlier = {run["scale"]["transactions"]: run["operations"] for run in previous["runs"]}
+    print(f"\nCompared with {previous['environment'].get('git_commit')} ({previous['environment']['timestamp']}):")
+    for run in current["runs"]:
+        count = run["scale"]["transactions"]
+        if count not in earlier:
+            continue
+        for name, result in run["operations"].items():
+            if name not in earlier[count]:
+                continue
+            before = earlier[count][name]["median_ms"]
+            ratio = result["median_ms"] / before if before else float("inf")
+            flag = ""
+            if ratio > max_slowdown:
+                regressions.append(f"{name} at {count}")
+                flag = "  <-- slower"
+            print(f"  {count:>10} {name:<28} {before:>10.3f} -> {result['median_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Campus Library Manager operations")
+    parser.add_argument("--scale", nargs="+", default=["10k"], help="transaction counts, e.g. 10k 1M 10M")
+    parser.add_argument("--runs", type=int, default=20, help="timed runs per operation")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", help="operation names to time")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier results JSON to compare medians against")
+    parser.add_argument("--max-slowdown", type=float, default=1.5,
+                        help="exit with status 1 if a median grows by more than this factor")
+    args = parser.parse_args()
+
+    # The ID allocator, archive and metrics go to a scratch directory, never the real data directory.
+    # Reloading re-reads LIBRARY_DATA_DIR; the functions in OPERATIONS share the module's globals, so they follow.
+    data_dir = tempfile.mkdtemp(prefix="library_benchmark_")
+    real_data_dir = os.environ.get("LIBRARY_DATA_DIR")
+    os.environ["LIBRARY_DATA_DIR"] = data_dir
+    try:
+        importlib.reload(library)
+        results = {"environment": environment(), "runs": []}
+        for scale in args.scale:
+            transaction_count = parse_scale(scale)
+            print(f"Scale: {transaction_count} transactions")
+            results["runs"].append(run_benchmark(transaction_count, args.runs, args.seed, args.only))
+    finally:
+        if real_data_dir is None:
+            del os.environ["LIBRARY_DATA_DIR"]
+        else:
+            os.environ["LIBRARY_DATA_DIR"] = real_data_dir
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), results, args.max_slowdown)
+        if regressions:
+            print(f"\nSlower than x{args.max_slowdown}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
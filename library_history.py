@@ -0,0 +1,103 @@
+# Campus Library Manager - Parallel history aggregation
+#
+# Recounts transaction and per-student totals straight from the
+# TransactionStore columns rather than the running indexes. Rows are split
+# into contiguous ranges (rows are kept in the order transactions were made)
+# and each range is aggregated in its own worker process. Workers only see
+# integer codes and numbers, never strings; the partial results are merged in
+# range order, so students come out in the order they were first seen, just
+# as a single pass over the rows would list them.
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress
+
+from library_store import DELETED, STATUS_CODES
+
+MIN_PARTITION_ROWS = 50000  # smaller ranges cost more to ship to a worker than to count in place
+
+# bytes.translate tables turning a status column into 0/1 masks for itertools.compress
+LIVE_MASK = bytes(0 if code == DELETED else 1 for code in range(256))
+BORROWED_MASK = bytes(1 if code == STATUS_CODES["borrowed"] else 0 for code in range(256))
+
+
+def partition_rows(row_count, parts):
+    """Split rows 0..row_count into parts contiguous (start, stop) ranges of near-equal size"""
+    size, extra = divmod(row_count, parts)
+    ranges = []
+    start = 0
+    for part in range(parts):
+        stop = start + size + (1 if part < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+def aggregate_rows(student_column, name_column, status_column, fine_column):
+    """Aggregate one row range
+
+    Returns (transactions, active_loans, fines, students) where students
+    maps a student code to [name code of its first row, loans, active loans, fines].
+    """
+    statuses = status_column.tobytes()
+    live = statuses.translate(LIVE_MASK)
+    live_students = list(compress(student_column, live))
+    loans = Counter(live_students)  # Keeps students in first-seen order
+    active = Counter(compress(student_column, statuses.translate(BORROWED_MASK)))
+    # Walking the rows backwards leaves each student's first name code in place
+    first_names = dict(zip(reversed(live_students), reversed(list(compress(name_column, live)))))
+
+    # Only late returns carry a fine (deleted rows hold 0.0), so few rows reach this loop
+    student_fines = {}
+    for student, fine in compress(zip(student_column, fine_column), fine_column):
+        student_fines[student] = student_fines.get(student, 0.0) + fine
+
+    students = {student: [first_names[student], count, active.get(student, 0), student_fines.get(student, 0.0)]
+                for student, count in loans.items()}
+    return len(live_students), sum(active.values()), sum(fine_column), students
+
+def partition_history(store, workers=None):
+    """Copy the columns of a TransactionStore in row ranges, one per worker process
+    
+    Uses up to workers ranges (default and at most: one per CPU), fewer
+    when there are not MIN_PARTITION_ROWS rows per range. This is the only
+    step that reads the store, so a caller that locks it can release the
+    lock before handing the result to aggregate_partitions. The string
+    tables only ever grow, so the references kept to them stay valid.
+    """
+    row_count = len(store.status_column)
+    cpus = os.cpu_count() or 1
+    parts = max(1, min(workers or cpus, cpus, row_count // MIN_PARTITION_ROWS))
+    
+    columns = (store.student_column, store.name_column, store.status_column, store.fine_column)
+    slices = [[column[start:stop] for column in columns] for start, stop in partition_rows(row_count, parts)]
+    return slices, store.student_ids.values, store.student_names.values
+
+def aggregate_partitions(partitions):
+    """Count transactions, active loans, fines and per-student totals of partition_history output
+    
+    Returns a dict with "transactions", "active_loans", "fines" and
+    "students", the last in student_stats form:
+    {student_id: {name, total_loans, active_loans, total_fines}}.
+    """
+    slices, student_ids, student_names = partitions
+    if len(slices) == 1:
+        partials = [aggregate_rows(*slices[0])]
+    else:
+        with ProcessPoolExecutor(len(slices)) as pool:
+            partials = list(pool.map(aggregate_rows, *zip(*slices)))
+    
+    totals = {"transactions": 0, "active_loans": 0, "fines": 0.0, "students": {}}
+    for count, active, fines, students in partials:
+        totals["transactions"] += count
+        totals["active_loans"] += active
+        totals["fines"] += fines
+        for student, (name, loans, student_active, student_fines) in students.items():
+            stats = totals["students"].get(student_ids[student])
+            if stats is None:
+                stats = totals["students"][student_ids[student]] = {
+                    "name": student_names[name], "total_loans": 0, "active_loans": 0, "total_fines": 0.0
+                }
+            stats["total_loans"] += loans
+            stats["active_loans"] += student_active
+            stats["total_fines"] += student_fines
+    return totals
@@ -1,8 +1,38 @@
  # Campus Library Manager - A Book Rental and Inventory System
 from typing import Dict, List, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime, date
+from bisect import bisect_left, bisect_right, insort
+import heapq
+from contextlib import ExitStack
+from collections import deque
+from itertools import islice
+from array import array
+import cProfile
+import csv
+import functools
+import gzip
 import json
 import os
+import pstats
+import sys
+import threading
+import time
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # Fine assessment falls back to the loan index
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; there only one process should open the data directory
+    fcntl = None
+
+from library_history import aggregate_partitions, partition_history
+from library_snapshot import read_snapshot_file, write_snapshot_file
+from library_sqlite import SQLiteStorage
+from library_store import TransactionStore
 
 # Global Data Storage
 books: Dict[str, Dict] = {
@@ -36,7 +66,8 @@ books: Dict[str, Dict] = {
 }
 
 # Transaction records: {transaction_id: {book_id, student_id, checkout_date, due_date, return_date, fine}}
-transactions: Dict[str, Dict] = {
+# held column-wise by TransactionStore; dates are stored as integer day ordinals
+transactions: TransactionStore = TransactionStore({
     "T001": {
         "book_id": "B001",
         "student_id": "S001",
@@ -57,12 +88,273 @@ transactions: Dict[str, Dict] = {
         "fine": 0.0,
         "status": "returned"
     }
-}
+})
+
+# Hold records: {"book_id:student_id": {book_id, student_id, student_name, queued, placed, expires, status}}
+# status is "waiting" in the book's queue or "ready" with a returned copy set aside;
+# queued orders the waiting holds of a book, placed/expires are day ordinals
+holds: Dict[str, Dict] = {}
 
 # Configuration
 LOAN_PERIOD_DAYS = 14
 FINE_PER_DAY = 2.0
 MAX_BOOKS_PER_STUDENT = 3
+HOLD_EXPIRY_DAYS = 30  # days a hold waits in the queue before lapsing
+HOLD_PICKUP_DAYS = 3  # days a copy set aside for a hold is kept for pickup
+FINE_BANDS = (1, 8, 15, 31, 61, 91)  # first day overdue of each fine assessment band
+HIGH_DEMAND_CHECKOUTS = 20  # popular books report flags titles above this
+IMPORT_BATCH_SIZE = 5000
+IMPORT_ERROR_LIMIT = 1000  # row errors kept in an import report
+REPORT_PAGE_SIZE = 50  # rows shown per page in long listings
+EXPORT_PAGE_SIZE = 5000  # rows read per lock hold while exporting
+REPORT_WORKERS = int(os.environ.get("LIBRARY_REPORT_WORKERS", "0"))  # recount processes; 0 = one per CPU
+
+# Persistent state location
+DATA_DIR = os.environ.get("LIBRARY_DATA_DIR", "library_data")
+TRANSACTION_ID_FILE = os.path.join(DATA_DIR, "transaction_ids.json")
+TRANSACTION_ID_BLOCK_SIZE = 100
+LOG_FILE = os.path.join(DATA_DIR, "library.log")
+LOCK_FILE = os.path.join(DATA_DIR, "library.lock")  # held by the one process that has the storage open
+SNAPSHOT_FILE = os.path.join(DATA_DIR, "snapshot.bin")
+JSON_SNAPSHOT_FILE = os.path.join(DATA_DIR, "snapshot.json")  # format before binary snapshots; read once to upgrade
+LOG_FSYNC_BATCH = int(os.environ.get("LIBRARY_FSYNC_BATCH", "1"))  # mutations written per fsync
+SNAPSHOT_INTERVAL = int(os.environ.get("LIBRARY_SNAPSHOT_INTERVAL", "1000"))  # mutations between snapshots
+STORAGE_BACKEND = os.environ.get("LIBRARY_STORAGE", "log")  # "log" (log + snapshots) or "sqlite"
+DATABASE_FILE = os.path.join(DATA_DIR, "library.db")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+ARCHIVE_STATE_FILE = os.path.join(ARCHIVE_DIR, "archive.json")
+ARCHIVE_AFTER_DAYS = int(os.environ.get("LIBRARY_ARCHIVE_AFTER_DAYS", "365"))  # age of returns moved to the archive
+ARCHIVE_SCAN_BYTES = 1 << 20  # read size when checking a segment for a torn member
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.prom")
+METRICS_WRITE_INTERVAL = float(os.environ.get("LIBRARY_METRICS_INTERVAL", "10"))  # seconds between metrics file writes
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILE_TOP_FUNCTIONS = 15  # hottest functions listed per action in a profile report
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # histogram upper bounds in seconds
+
+# Transaction ID allocator: next number to hand out, the usable high-water mark and the one on disk
+id_allocator = {"next_id": 0, "reserved_until": 0, "saved_until": 0, "loaded": False}
+
+# Locks: one per book and per student guard check-then-update sequences;
+# shared_lock guards the dicts' key sets, the shared indexes and buffered storage writes;
+# log_lock lets one thread at a time fsync the log, taken before shared_lock and never inside it
+lock_registry_lock = threading.Lock()
+book_locks: Dict[str, threading.Lock] = {}
+student_locks: Dict[str, threading.Lock] = {}
+shared_lock = threading.RLock()
+id_lock = threading.Lock()
+id_file_lock = threading.Lock()  # one writer of TRANSACTION_ID_FILE at a time
+log_lock = threading.Lock()
+
+# Storage state (log/db stay None until open_storage() is called)
+storage = {"log": None, "db": None, "lock": None, "sequence": 0, "synced_sequence": 0, "unsynced": 0,
+           "since_snapshot": 0}
+
+# Archive: every returned transaction with return_date < archived_before lives in the
+# gzip segments under ARCHIVE_DIR; the totals keep reports whole without reading them
+archive_state = {"archived_before": 0, "transactions": 0, "fines": 0.0, "students": {}}
+
+# Indexes derived from books/transactions (see rebuild_indexes)
+student_open_loans: Dict[str, set] = {}  # student_id -> IDs of transactions still borrowed
+loans_by_due_date: List[Tuple[int, str]] = []  # sorted (due_date, transaction_id) of borrowed loans
+loan_due_days = array("i")  # due_date of each loans_by_due_date entry, sliced straight into NumPy
+
+# Popularity rankings: {"buckets": checkout_count -> {book_id: None}, "counts": sorted distinct counts}
+popularity = {"buckets": {}, "counts": []}
+genre_popularity: Dict[str, Dict] = {}  # genre_key(genre) -> ranking of the same shape
+
+# Per-student totals: student_id -> {name, total_loans, active_loans, total_fines}
+student_stats: Dict[str, Dict] = {}
+STUDENT_STATS_COLUMNS = ("student_id", "name", "total_loans", "active_loans", "total_fines")
+
+# Hold indexes (see rebuild_hold_indexes): per-book FIFO queues of (queued, hold key), keys of
+# the ready holds (copies set aside) per book, ready hold counts per student and a heap of
+# (expires, queued, hold key) driving expiry. Queue and heap entries outlive their hold and
+# are skipped when reached
+hold_queues: Dict[str, deque] = {}
+ready_holds: Dict[str, set] = {}
+student_ready_holds: Dict[str, int] = {}
+waiting_holds: Dict[str, int] = {}  # book_id -> holds still waiting in its queue
+hold_expiry: List[Tuple[int, int, str]] = []
+hold_state = {"next_queued": 0}
+
+# Running inventory totals (borrowed copies = total - available; active loans = len(loans_by_due_date))
+inventory_totals = {"total_titles": 0, "total_copies": 0, "available_copies": 0}
+
+# Operation metrics: name -> {calls, errors, seconds, max_seconds, buckets, scanned, returned}
+performance: Dict[str, Dict] = {}
+metrics_lock = threading.Lock()
+metrics_context = threading.local()  # per-thread stack of [scanned, returned] for running operations
+metrics_file_state = {"written_at": 0.0}  # guarded by metrics_lock
+metrics_file_lock = threading.Lock()  # one writer of METRICS_FILE at a time
+
+# Report cache: data_version counts inventory/loan mutations; results maps
+# (report, arguments) -> (data_version, day or None, result) and only answers for the current version
+report_cache = {"data_version": 0, "results": {}, "hits": 0, "misses": 0}
+cache_lock = threading.Lock()  # guards report_cache; taken after shared_lock, never held while building
+
+# Search index: field -> n-gram (1 to SEARCH_GRAM_SIZE chars) -> book IDs containing it
+SEARCH_FIELDS = ("title", "author", "genre")
+SEARCH_GRAM_SIZE = 3
+search_index: Dict[str, Dict[str, set]] = {field: {} for field in SEARCH_FIELDS}
+
+# =============================================================================
+# INSTRUMENTATION
+# =============================================================================
+
+def instrumented(function):
+    """Decorator counting calls, errors, latency and records scanned/returned of an operation"""
+    name = function.__name__
+    
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        running = getattr(metrics_context, "operations", None)
+        if running is None:
+            running = metrics_context.operations = []
+        counts = [0, 0]
+        running.append(counts)
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            seconds = time.perf_counter() - start
+            running.pop()
+            record_operation(name, seconds, counts[0], counts[1], failed)
+    return wrapper
+
+def record_scan(scanned, returned):
+    """Count records the innermost running operation looked at and handed back"""
+    running = getattr(metrics_context, "operations", None)
+    if running:
+        running[-1][0] += scanned
+        running[-1][1] += returned
+
+def record_operation(name, seconds, scanned, returned, failed):
+    """Add one call to an operation's metrics"""
+    with metrics_lock:
+        metrics = performance.get(name)
+        if metrics is None:
+            metrics = performance[name] = {
+                "calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1), "scanned": 0, "returned": 0
+            }
+        metrics["calls"] += 1
+        metrics["errors"] += failed
+        metrics["seconds"] += seconds
+        metrics["max_seconds"] = max(metrics["max_seconds"], seconds)
+        metrics["buckets"][bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        metrics["scanned"] += scanned
+        metrics["returned"] += returned
+        
+        # Only a running library (storage open) keeps the scrape file fresh; the
+        # thread that finds the interval up claims the write, so others skip it
+        now = time.monotonic()
+        due = ((storage["log"] is not None or storage["db"] is not None)
+               and now - metrics_file_state["written_at"] >= METRICS_WRITE_INTERVAL)
+        if due:
+            metrics_file_state["written_at"] = now
+    
+    if due:
+        write_metrics_file()
+
+def latency_percentile(buckets, fraction):
+    """Get the bucket upper bound (seconds) under which a fraction of calls finished, None if beyond the last"""
+    target = fraction * sum(buckets)
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, buckets):
+        seen += count
+        if seen >= target:
+            return bound
+    return None
+
+def metrics_text():
+    """Render the operation metrics in the Prometheus text exposition format"""
+    with metrics_lock:
+        snapshot = {name: dict(metrics, buckets=list(metrics["buckets"])) for name, metrics in performance.items()}
+    
+    lines = []
+    for metric, kind, help_text, field in (
+            ("library_operation_calls_total", "counter", "Calls per operation", "calls"),
+            ("library_operation_errors_total", "counter", "Calls that raised an exception", "errors"),
+            ("library_records_scanned_total", "counter", "Records examined by an operation", "scanned"),
+            ("library_records_returned_total", "counter", "Records returned by an operation", "returned")):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, metrics in sorted(snapshot.items()):
+            lines.append(f'{metric}{{operation="{name}"}} {metrics[field]}')
+    
+    lines.append("# HELP library_operation_duration_seconds Operation latency")
+    lines.append("# TYPE library_operation_duration_seconds histogram")
+    for name, metrics in sorted(snapshot.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), metrics["buckets"]):
+            cumulative += count
+            lines.append(f'library_operation_duration_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'library_operation_duration_seconds_sum{{operation="{name}"}} {metrics["seconds"]:.6f}')
+        lines.append(f'library_operation_duration_seconds_count{{operation="{name}"}} {metrics["calls"]}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics_file():
+    """Atomically rewrite METRICS_FILE for a local scraper, returning whether it was written
+    
+    A failed write is reported but never raised: it runs after operations
+    that have already happened, which must not be reported as failed.
+    """
+    with metrics_file_lock:  # writers share the temp file
+        with metrics_lock:
+            metrics_file_state["written_at"] = time.monotonic()
+        temp_file = METRICS_FILE + ".tmp"
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            with open(temp_file, "w") as f:
+                f.write(metrics_text())
+            os.replace(temp_file, METRICS_FILE)
+        except OSError as e:
+            print(f"Metrics file write failed: {e}", file=sys.stderr)
+            return False
+    return True
+
+# =============================================================================
+# REPORT CACHE
+# =============================================================================
+
+def data_changed():
+    """Bump the data version after a mutation so cached reports are rebuilt (caller holds shared_lock)"""
+    with cache_lock:
+        report_cache["data_version"] += 1
+        report_cache["results"].clear()
+
+def cached_report(dated=False):
+    """Decorator reusing a report builder's result until the data version (and, if dated, the day) changes
+    
+    Callers must treat the returned report as read-only, since later
+    views get the same object back.
+    """
+    def decorate(function):
+        name = function.__name__
+        
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            day = get_current_day() if dated else None
+            with cache_lock:
+                version = report_cache["data_version"]
+                entry = report_cache["results"].get(key)
+                if entry is not None and entry[0] == version and entry[1] == day:
+                    report_cache["hits"] += 1
+                    return entry[2]
+                report_cache["misses"] += 1
+            
+            # Stored under the version read before building, so a mutation
+            # made meanwhile leaves the entry stale instead of wrongly current
+            result = function(*args, **kwargs)
+            with cache_lock:
+                report_cache["results"][key] = (version, day, result)
+            return result
+        return wrapper
+    return decorate
 
 # =============================================================================
 # UTILITY FUNCTIONS
@@ -72,23 +364,103 @@ def get_current_date():
     """Get current date as string"""
     return datetime.now().strftime("%Y-%m-%d")
 
+def get_current_day():
+    """Get current date as a day ordinal"""
+    return date.today().toordinal()
+
 def parse_date(date_str):
     """Parse date string to datetime object"""
     return datetime.strptime(date_str, "%Y-%m-%d")
 
-def calculate_days_difference(date1_str, date2_str):
-    """Calculate difference in days between two dates"""
-    date1 = parse_date(date1_str)
-    date2 = parse_date(date2_str)
-    return (date2 - date1).days
+def to_day(value):
+    """Convert a date string (or an existing day ordinal) to a day ordinal"""
+    if value is None or isinstance(value, int):
+        return value
+    return parse_date(value).toordinal()
+
+def format_day(day):
+    """Convert a day ordinal to a date string for display and export"""
+    if day is None:
+        return ""
+    return date.fromordinal(day).strftime("%Y-%m-%d")
+
+def get_lock(registry, key):
+    """Get (creating if needed) the lock for one book or student"""
+    lock = registry.get(key)
+    if lock is None:
+        with lock_registry_lock:
+            lock = registry.setdefault(key, threading.Lock())
+    return lock
+
+def transaction_number(transaction_id):
+    """Get the numeric part of a transaction ID"""
+    return int(transaction_id[1:])
+
+def format_transaction_id(number):
+    """Format a number as a transaction ID"""
+    return f"T{number:03d}"
+
+def load_id_allocator():
+    """Initialise the ID allocator from the saved high-water mark and existing transactions"""
+    high_water_mark = 0
+    if os.path.exists(TRANSACTION_ID_FILE):
+        with open(TRANSACTION_ID_FILE) as f:
+            high_water_mark = json.load(f).get("reserved_until", 0)
+    
+    # Covers records created before the mark was saved; max over the number column runs in C
+    max_id = max(transactions.number_column, default=0)
+    
+    id_allocator["next_id"] = max(high_water_mark, max_id) + 1
+    id_allocator["reserved_until"] = id_allocator["next_id"] - 1
+    id_allocator["saved_until"] = high_water_mark
+    id_allocator["loaded"] = True
+
+def save_id_high_water_mark(reserved_until):
+    """Save the highest reserved transaction number to disk, never lowering it"""
+    with id_file_lock:
+        if reserved_until <= id_allocator["saved_until"]:
+            return
+        os.makedirs(DATA_DIR, exist_ok=True)
+        temp_file = TRANSACTION_ID_FILE + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"reserved_until": reserved_until}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, TRANSACTION_ID_FILE)
+        id_allocator["saved_until"] = reserved_until
+
+def reserve_transaction_ids(count):
+    """Reserve a block of consecutive transaction IDs"""
+    with id_lock:
+        if not id_allocator["loaded"]:
+            load_id_allocator()
+        
+        first = id_allocator["next_id"]
+        last = first + count - 1
+        id_allocator["next_id"] = last + 1
+        
+        # Only touch the disk when the reserved block runs out (top_up_transaction_ids usually gets there first)
+        if last > id_allocator["reserved_until"]:
+            id_allocator["reserved_until"] = last + TRANSACTION_ID_BLOCK_SIZE
+            save_id_high_water_mark(id_allocator["reserved_until"])
+    
+    return [format_transaction_id(number) for number in range(first, last + 1)]
+
+def top_up_transaction_ids():
+    """Save the next block of IDs once half the reserved block is used, so checkouts rarely wait on the file"""
+    with id_lock:
+        if (not id_allocator["loaded"]
+                or id_allocator["reserved_until"] - id_allocator["next_id"] >= TRANSACTION_ID_BLOCK_SIZE // 2):
+            return
+        reserved_until = id_allocator["reserved_until"] + TRANSACTION_ID_BLOCK_SIZE
+    # IDs are only handed out up to a mark once it is on disk
+    save_id_high_water_mark(reserved_until)
+    with id_lock:
+        id_allocator["reserved_until"] = max(id_allocator["reserved_until"], reserved_until)
 
 def generate_transaction_id():
     """Generate next transaction ID"""
-    if not transactions:
-        return "T001"
-    
-    max_id = max([int(tid[1:]) for tid in transactions.keys()])
-    return f"T{max_id + 1:03d}"
+    return reserve_transaction_ids(1)[0]
 
 def book_exists(book_id):
     """Check if book exists"""
@@ -96,16 +468,769 @@ def book_exists(book_id):
 
 def get_student_active_loans(student_id):
     """Get number of active loans for a student"""
-    count = 0
-    for trans in transactions.values():
-        if trans["student_id"] == student_id and trans["status"] == "borrowed":
-            count += 1
-    return count
+    return len(student_open_loans.get(student_id, ()))
+
+@instrumented
+def get_student_open_transactions(student_id):
+    """Get (transaction_id, transaction) pairs a student currently has borrowed"""
+    with shared_lock:
+        if storage["db"] is not None:
+            open_loans = storage["db"].student_loans(student_id)  # Indexed on (student_id, status)
+        else:
+            open_loans = [(tid, transactions[tid])
+                          for tid in sorted(student_open_loans.get(student_id, ()), key=transaction_number)]
+        record_scan(len(open_loans), len(open_loans))
+        return open_loans
+
+# =============================================================================
+# INDEXES
+# =============================================================================
+
+def index_open_loan(transaction_id, trans):
+    """Add a borrowed transaction to the loan indexes"""
+    student_open_loans.setdefault(trans["student_id"], set()).add(transaction_id)
+    entry = (trans["due_date"], transaction_id)
+    position = bisect_left(loans_by_due_date, entry)
+    loans_by_due_date.insert(position, entry)
+    loan_due_days.insert(position, entry[0])
+
+def unindex_open_loan(transaction_id, trans):
+    """Remove a returned transaction from the loan indexes"""
+    open_loans = student_open_loans.get(trans["student_id"])
+    if open_loans is not None:
+        open_loans.discard(transaction_id)
+        if not open_loans:
+            del student_open_loans[trans["student_id"]]
+    
+    entry = (trans["due_date"], transaction_id)
+    position = bisect_left(loans_by_due_date, entry)
+    if position < len(loans_by_due_date) and loans_by_due_date[position] == entry:
+        del loans_by_due_date[position]
+        del loan_due_days[position]
+
+def count_overdue_loans(as_of_day):
+    """Count borrowed loans that were due before the given day"""
+    return bisect_left(loans_by_due_date, (as_of_day,))
+
+def overdue_days(as_of_day):
+    """Get the days overdue of every borrowed loan due before a day
+    
+    Only the overdue end of loan_due_days is copied, under shared_lock;
+    with NumPy the days come back as an int64 array, otherwise as a list.
+    """
+    with shared_lock:
+        count = count_overdue_loans(as_of_day)
+        due_days = loan_due_days[:count]
+    record_scan(count, 0)
+    if np is None:
+        return [as_of_day - due_day for due_day in due_days]
+    return as_of_day - np.frombuffer(due_days, dtype=np.intc).astype(np.int64)
+
+@cached_report()
+def calculate_pending_fines(as_of_day):
+    """Total fines owed on loans that are still out and overdue"""
+    days = overdue_days(as_of_day)
+    return int(days.sum() if np is not None else sum(days)) * FINE_PER_DAY
+
+def assess_fines(as_of_day):
+    """Count overdue loans and their fines in total and per FINE_BANDS band"""
+    days = overdue_days(as_of_day)
+    if np is not None:
+        loans_per_day = np.bincount(days, minlength=FINE_BANDS[-1] + 1)
+        band_loans = np.add.reduceat(loans_per_day, FINE_BANDS).tolist()
+        band_days = np.add.reduceat(loans_per_day * np.arange(len(loans_per_day)), FINE_BANDS).tolist()
+        total_days = int(days.sum())
+        max_days = int(days.max()) if len(days) else 0
+    else:
+        band_loans = [0] * len(FINE_BANDS)
+        band_days = [0] * len(FINE_BANDS)
+        for days_late in days:
+            band = bisect_right(FINE_BANDS, days_late) - 1
+            band_loans[band] += 1
+            band_days[band] += days_late
+        total_days = sum(days)
+        max_days = max(days, default=0)
+    
+    return {
+        "overdue_loans": len(days),
+        "overdue_days": total_days,
+        "pending_fines": total_days * FINE_PER_DAY,
+        "max_days_overdue": max_days,
+        "bands": [(first_day, band_loans[band], band_days[band] * FINE_PER_DAY)
+                  for band, first_day in enumerate(FINE_BANDS)]
+    }
+
+def text_grams(text):
+    """Get every n-gram of up to SEARCH_GRAM_SIZE characters in a lowercase string"""
+    grams = set()
+    for size in range(1, SEARCH_GRAM_SIZE + 1):
+        for start in range(len(text) - size + 1):
+            grams.add(text[start:start + size])
+    return grams
+
+def pattern_grams(pattern):
+    """Get the n-grams that must all be present for a string to contain the pattern"""
+    if len(pattern) <= SEARCH_GRAM_SIZE:
+        return [pattern]
+    return [pattern[i:i + SEARCH_GRAM_SIZE] for i in range(len(pattern) - SEARCH_GRAM_SIZE + 1)]
+
+def index_book(book_id):
+    """Add a book's title, author and genre to the search index"""
+    book = books[book_id]
+    for field in SEARCH_FIELDS:
+        field_index = search_index[field]
+        for gram in text_grams(book[field].lower()):
+            field_index.setdefault(gram, set()).add(book_id)
+
+def unindex_book(book_id):
+    """Remove a book's current title, author and genre from the search index"""
+    book = books[book_id]
+    for field in SEARCH_FIELDS:
+        field_index = search_index[field]
+        for gram in text_grams(book[field].lower()):
+            postings = field_index.get(gram)
+            if postings is not None:
+                postings.discard(book_id)
+                if not postings:
+                    del field_index[gram]
+
+def add_to_ranking(ranking, book_id, count):
+    """Put a book in the bucket for its checkout count"""
+    bucket = ranking["buckets"].get(count)
+    if bucket is None:
+        bucket = ranking["buckets"][count] = {}
+        insort(ranking["counts"], count)
+    bucket[book_id] = None
+
+def remove_from_ranking(ranking, book_id, count):
+    """Take a book out of the bucket for its checkout count"""
+    bucket = ranking["buckets"].get(count)
+    if bucket is None or book_id not in bucket:
+        return
+    del bucket[book_id]
+    if not bucket:
+        del ranking["buckets"][count]
+        del ranking["counts"][bisect_left(ranking["counts"], count)]
+
+def genre_key(genre):
+    """Get the key a genre is ranked under, so "history " and "History" are one genre"""
+    return genre.strip().lower()
+
+def rank_book(book_id):
+    """Add a book to the overall and per-genre popularity rankings"""
+    book = books[book_id]
+    add_to_ranking(popularity, book_id, book['checkout_count'])
+    genre_ranking = genre_popularity.setdefault(genre_key(book['genre']), {"buckets": {}, "counts": []})
+    add_to_ranking(genre_ranking, book_id, book['checkout_count'])
+
+def unrank_book(book_id):
+    """Remove a book from the popularity rankings (before its count or genre changes)"""
+    book = books[book_id]
+    remove_from_ranking(popularity, book_id, book['checkout_count'])
+    genre_ranking = genre_popularity.get(genre_key(book['genre']))
+    if genre_ranking is not None:
+        remove_from_ranking(genre_ranking, book_id, book['checkout_count'])
+        if not genre_ranking["counts"]:
+            del genre_popularity[genre_key(book['genre'])]
+
+def top_books(limit, genre=None):
+    """Get the IDs of the most borrowed books, optionally within one genre (any letter case)"""
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    ranking = popularity if genre is None else genre_popularity.get(genre_key(genre))
+    if ranking is None:
+        return []
+    
+    # Every bucket holds at least one book, so this visits at most `limit` buckets
+    result = []
+    for count in reversed(ranking["counts"]):
+        for book_id in ranking["buckets"][count]:
+            result.append(book_id)
+            if len(result) == limit:
+                return result
+    return result
+
+def books_above_checkouts(threshold, genre=None):
+    """Get the IDs of books with more than `threshold` checkouts, most borrowed first"""
+    ranking = popularity if genre is None else genre_popularity.get(genre_key(genre))
+    if ranking is None:
+        return []
+    counts = ranking["counts"]
+    return [book_id for count in reversed(counts[bisect_right(counts, threshold):])
+            for book_id in ranking["buckets"][count]]
+
+def count_books_above_checkouts(threshold, genre=None):
+    """Count books with more than `threshold` checkouts"""
+    ranking = popularity if genre is None else genre_popularity.get(genre_key(genre))
+    if ranking is None:
+        return 0
+    counts = ranking["counts"]
+    return sum(len(ranking["buckets"][count]) for count in counts[bisect_right(counts, threshold):])
+
+def record_student_checkout(trans):
+    """Count a new loan in the student's totals"""
+    stats = student_stats.get(trans['student_id'])
+    if stats is None:
+        stats = student_stats[trans['student_id']] = {
+            'name': trans['student_name'],
+            'total_loans': 0,
+            'active_loans': 0,
+            'total_fines': 0.0
+        }
+    stats['total_loans'] += 1
+    if trans['status'] == 'borrowed':
+        stats['active_loans'] += 1
+    stats['total_fines'] += trans['fine']
+
+def record_student_return(trans):
+    """Move a returned loan from active to history and add its fine"""
+    stats = student_stats[trans['student_id']]
+    stats['active_loans'] -= 1
+    stats['total_fines'] += trans['fine']
+
+def count_inventory_totals():
+    """Recompute the inventory totals by scanning every book"""
+    return {
+        "total_titles": len(books),
+        "total_copies": sum(book['total_copies'] for book in books.values()),
+        "available_copies": sum(book['available_copies'] for book in books.values())
+    }
+
+def check_inventory_totals(repair=False):
+    """Compare the running totals with a full scan; returns a list of mismatches"""
+    problems = []
+    with shared_lock:
+        for name, actual in count_inventory_totals().items():
+            if inventory_totals[name] != actual:
+                problems.append(f"{name} is {inventory_totals[name]}, expected {actual}")
+                if repair:
+                    inventory_totals[name] = actual
+                    data_changed()
+        
+        active_loans = transactions.count_status('borrowed')
+        if active_loans != len(loans_by_due_date):
+            problems.append(f"active_loans is {len(loans_by_due_date)}, expected {active_loans}")
+        if len(loan_due_days) != len(loans_by_due_date):
+            problems.append(f"loan_due_days has {len(loan_due_days)} entries, expected {len(loans_by_due_date)}")
+    return problems
+
+def hold_key(book_id, student_id):
+    """Get the key of a student's hold on a book"""
+    return f"{book_id}:{student_id}"
+
+def index_hold(key, hold):
+    """Add a hold to the queue, shelf and expiry indexes"""
+    if hold['status'] == 'waiting':
+        hold_queues.setdefault(hold['book_id'], deque()).append((hold['queued'], key))
+        waiting_holds[hold['book_id']] = waiting_holds.get(hold['book_id'], 0) + 1
+    else:
+        ready_holds.setdefault(hold['book_id'], set()).add(key)
+        student_ready_holds[hold['student_id']] = student_ready_holds.get(hold['student_id'], 0) + 1
+    heapq.heappush(hold_expiry, (hold['expires'], hold['queued'], key))
+    hold_state["next_queued"] = max(hold_state["next_queued"], hold['queued'] + 1)
+
+def release_hold(key):
+    """Remove a hold, giving back its set-aside copy if it had one; returns the change to log
+    
+    A waiting hold's queue entry and every hold's expiry entry are left in
+    place and skipped once reached, so removal never searches them.
+    """
+    hold = holds.pop(key)
+    if hold['status'] == 'ready':
+        ready_holds[hold['book_id']].discard(key)
+        student_ready_holds[hold['student_id']] -= 1
+    else:
+        waiting_holds[hold['book_id']] -= 1
+    return ("hold", key, None)
+
+def held_copies(book_id):
+    """Count copies of a book set aside for holders"""
+    return len(ready_holds.get(book_id, ()))
+
+def current_hold(key, queued):
+    """Get the hold a queue or expiry entry was made for, or None if it has since gone"""
+    hold = holds.get(key)
+    return hold if hold is not None and hold['queued'] == queued else None
+
+def rebuild_hold_indexes():
+    """Rebuild the hold indexes from the holds dict"""
+    hold_queues.clear()
+    ready_holds.clear()
+    student_ready_holds.clear()
+    waiting_holds.clear()
+    hold_expiry.clear()
+    hold_state["next_queued"] = 0
+    for key, hold in sorted(holds.items(), key=lambda item: item[1]['queued']):
+        index_hold(key, hold)
+
+def rebuild_indexes():
+    """Rebuild every index from the books, transactions and holds dicts"""
+    for field_index in search_index.values():
+        field_index.clear()
+    popularity["buckets"].clear()
+    popularity["counts"].clear()
+    genre_popularity.clear()
+    for book_id in books:
+        index_book(book_id)
+        rank_book(book_id)
+    inventory_totals.update(count_inventory_totals())
+    
+    student_open_loans.clear()
+    loans_by_due_date.clear()
+    student_stats.clear()
+    for student_id, archived in archive_state["students"].items():
+        student_stats[student_id] = {
+            'name': archived['name'],
+            'total_loans': archived['total_loans'],
+            'active_loans': 0,
+            'total_fines': archived['total_fines']
+        }
+    students, open_loans = transactions.loan_totals()
+    for student_id, (name, total_loans, active_loans, total_fines) in students.items():
+        stats = student_stats.setdefault(student_id, {'name': name, 'total_loans': 0, 'active_loans': 0,
+                                                      'total_fines': 0.0})
+        stats['total_loans'] += total_loans
+        stats['active_loans'] += active_loans
+        stats['total_fines'] += total_fines
+    for due_day, trans_id, student_id in open_loans:
+        student_open_loans.setdefault(student_id, set()).add(trans_id)
+        loans_by_due_date.append((due_day, trans_id))
+    loans_by_due_date.sort()  # One sort instead of an insort per loan
+    loan_due_days[:] = array("i", [due_day for due_day, _ in loans_by_due_date])
+    rebuild_hold_indexes()
+    data_changed()
+
+rebuild_indexes()
+
+# =============================================================================
+# PERSISTENCE
+# =============================================================================
+
+def log_mutation(*changes):
+    """Write changed records to the active storage backend (caller holds shared_lock)
+    
+    Each change is a (kind, key, record) tuple where kind is "book",
+    "transaction" or "hold"; a None record deletes the transaction or hold.
+    Records are only buffered here: commit_log, run once shared_lock is
+    released, makes them durable and takes the periodic snapshot.
+    """
+    if storage["db"] is not None:
+        storage["db"].save(changes)
+    elif storage["log"] is not None:
+        lines = []
+        for kind, key, record in changes:
+            storage["sequence"] += 1
+            lines.append(json.dumps({"seq": storage["sequence"], "kind": kind, "id": key,
+                                    "data": dict(record) if record is not None else None}))
+        storage["log"].write("\n".join(lines) + "\n")
+    else:
+        return
+    
+    storage["unsynced"] += 1
+    storage["since_snapshot"] += 1
+
+def commit_log():
+    """Make logged records durable every LOG_FSYNC_BATCH mutations and snapshot every SNAPSHOT_INTERVAL
+    
+    Call without shared_lock held. The log fsync runs outside shared_lock,
+    so checkouts carry on meanwhile; threads queue on log_lock instead and
+    usually find their records already covered by the fsync before them
+    (group commit). SQLite commits and snapshots still need shared_lock.
+    The next block of transaction IDs is saved here too, ahead of need.
+    """
+    wanted = storage["sequence"]
+    with log_lock:
+        with shared_lock:
+            if storage["unsynced"] < LOG_FSYNC_BATCH or storage["synced_sequence"] >= wanted > 0:
+                log_file = None
+            elif storage["db"] is not None or storage["log"] is None:
+                sync_log()
+                log_file = None
+            else:
+                storage["log"].flush()
+                storage["unsynced"] = 0
+                synced = storage["sequence"]
+                log_file = os.dup(storage["log"].fileno())  # Stays valid if a snapshot reopens the log
+        if log_file is not None:
+            try:
+                os.fsync(log_file)
+            finally:
+                os.close(log_file)
+            storage["synced_sequence"] = max(storage["synced_sequence"], synced)
+        
+        if storage["since_snapshot"] >= SNAPSHOT_INTERVAL:
+            with shared_lock:
+                if storage["since_snapshot"] >= SNAPSHOT_INTERVAL:
+                    write_snapshot()
+    top_up_transaction_ids()
+
+def commits_log(function):
+    """Decorator running commit_log after a mutating operation returns and has let go of its locks"""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            commit_log()
+    return wrapper
+
+def sync_log():
+    """Flush buffered log records (or the open SQLite transaction) to disk (caller holds shared_lock)"""
+    if storage["db"] is not None:
+        storage["db"].commit()
+    elif storage["log"] is not None:
+        storage["log"].flush()
+        os.fsync(storage["log"].fileno())
+        storage["synced_sequence"] = storage["sequence"]
+    storage["unsynced"] = 0
+
+def write_snapshot():
+    """Write all books and transactions to a new snapshot and start an empty log"""
+    sync_log()
+    if storage["db"] is not None:
+        storage["db"].checkpoint()
+        storage["since_snapshot"] = 0
+        return
+    
+    os.makedirs(DATA_DIR, exist_ok=True)
+    temp_file = SNAPSHOT_FILE + ".tmp"
+    with open(temp_file, "wb") as f:
+        write_snapshot_file(f, storage["sequence"], books, transactions, holds)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, SNAPSHOT_FILE)
+    if os.path.exists(JSON_SNAPSHOT_FILE):
+        os.remove(JSON_SNAPSHOT_FILE)
+    
+    # Records up to the snapshot's sequence are skipped on replay, so a crash
+    # before the truncate below is harmless
+    if storage["log"] is not None:
+        storage["log"].close()
+        storage["log"] = open(LOG_FILE, "w")
+    storage["since_snapshot"] = 0
+
+def replay_log(after_sequence):
+    """Apply log records newer than the snapshot; returns the last sequence applied
+    
+    A torn record at the end of the log (a crash mid-write) is cut off the
+    file, so records appended afterwards start on a line of their own.
+    """
+    sequence = after_sequence
+    if not os.path.exists(LOG_FILE):
+        return sequence
+    
+    good_bytes = 0
+    with open(LOG_FILE, "rb") as f:
+        for line in f:
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("unterminated record")
+                entry = json.loads(line)
+            except ValueError:
+                break  # Torn write at the end of the log
+            good_bytes += len(line)
+            if entry["seq"] <= after_sequence:
+                continue
+            target = {"book": books, "hold": holds}.get(entry["kind"], transactions)
+            if entry["data"] is None:
+                target.pop(entry["id"], None)
+            else:
+                target[entry["id"]] = entry["data"]
+            sequence = entry["seq"]
+    
+    if good_bytes < os.path.getsize(LOG_FILE):
+        with open(LOG_FILE, "r+b") as f:
+            f.truncate(good_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+    return sequence
+
+def open_sqlite_storage():
+    """Load books and transactions from the SQLite database, seeding it on first run"""
+    database = SQLiteStorage(DATABASE_FILE)
+    if database.is_empty():
+        database.save_all(books, transactions, holds)
+    else:
+        database.load_into(books, transactions, holds)
+    
+    load_archive_state()
+    rebuild_indexes()
+    id_allocator["loaded"] = False
+    storage["db"] = database
+    storage["unsynced"] = 0
+    storage["since_snapshot"] = 0
+
+def lock_data_dir():
+    """Take the exclusive lock on DATA_DIR, so a second process cannot write the same log and snapshots"""
+    lock = open(LOCK_FILE, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            raise RuntimeError(f"{DATA_DIR} is already open in another process; stop it and try again")
+    storage["lock"] = lock
+
+def unlock_data_dir():
+    """Release the DATA_DIR lock taken by open_storage"""
+    if storage["lock"] is not None:
+        storage["lock"].close()  # Closing the file drops the flock
+        storage["lock"] = None
+
+def open_storage():
+    """Load the last snapshot plus the log tail, then start logging mutations"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    lock_data_dir()
+    if STORAGE_BACKEND == "sqlite":
+        open_sqlite_storage()
+        return
+    
+    has_snapshot = os.path.exists(SNAPSHOT_FILE) or os.path.exists(JSON_SNAPSHOT_FILE)
+    snapshot_sequence = 0
+    if os.path.exists(SNAPSHOT_FILE):
+        snapshot_sequence = read_snapshot_file(SNAPSHOT_FILE, books, transactions, holds)
+    elif has_snapshot:
+        with open(JSON_SNAPSHOT_FILE) as f:
+            snapshot = json.load(f)
+        snapshot_sequence = snapshot["sequence"]
+        books.clear()
+        books.update(snapshot["books"])
+        transactions.clear()
+        transactions.update(snapshot["transactions"])
+        holds.clear()
+    
+    storage["sequence"] = storage["synced_sequence"] = replay_log(snapshot_sequence)
+    load_archive_state()
+    rebuild_indexes()
+    id_allocator["loaded"] = False
+    
+    storage["log"] = open(LOG_FILE, "a")
+    storage["unsynced"] = 0
+    storage["since_snapshot"] = storage["sequence"] - snapshot_sequence
+    
+    # First run: capture the seed data so the log only has to hold changes
+    if not has_snapshot:
+        write_snapshot()
+
+def close_storage():
+    """Compact the log into a snapshot, stop logging and release the data directory"""
+    if storage["db"] is not None or storage["log"] is not None:
+        write_metrics_file()
+    if storage["db"] is not None:
+        storage["db"].close()
+        storage["db"] = None
+    if storage["log"] is not None:
+        write_snapshot()
+        storage["log"].close()
+        storage["log"] = None
+    unlock_data_dir()
+
+# =============================================================================
+# ARCHIVE
+# =============================================================================
+
+def archive_segment_file(day):
+    """Get the segment file for transactions returned in the month of a day ordinal"""
+    return os.path.join(ARCHIVE_DIR, date.fromordinal(day).strftime("%Y-%m") + ".jsonl.gz")
+
+def load_archive_state():
+    """Read the archive totals and drop live copies of transactions already archived
+    
+    Copies are left behind when an archive run stops between saving the
+    archive state and logging the deletions.
+    """
+    archive_state.update(archived_before=0, transactions=0, fines=0.0, students={})
+    if os.path.exists(ARCHIVE_STATE_FILE):
+        with open(ARCHIVE_STATE_FILE) as f:
+            archive_state.update(json.load(f))
+    for trans_id in transactions.returned_before(archive_state["archived_before"]):
+        del transactions[trans_id]
+    transactions.compact()
+
+def write_archive_state():
+    """Atomically replace the archive state file"""
+    temp_file = ARCHIVE_STATE_FILE + ".tmp"
+    with open(temp_file, "w") as f:
+        json.dump(archive_state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, ARCHIVE_STATE_FILE)
+
+def complete_segment_length(path):
+    """Get how many bytes at the start of a segment are whole gzip members
+    
+    A crash part-way through an append leaves a torn member at the end,
+    which would stop readers reaching any member appended after it.
+    """
+    complete = 0
+    offset = 0
+    member = zlib.decompressobj(wbits=31)  # 31 reads one gzip member
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(ARCHIVE_SCAN_BYTES)
+            if not chunk:
+                return complete
+            while chunk:
+                try:
+                    member.decompress(chunk)
+                except zlib.error:
+                    return complete
+                if not member.eof:
+                    offset += len(chunk)
+                    break
+                offset += len(chunk) - len(member.unused_data)
+                complete = offset
+                chunk = member.unused_data
+                member = zlib.decompressobj(wbits=31)
+
+def append_archive_segment(path, lines):
+    """Append JSON lines to a segment as a new gzip member and fsync it, first cutting off any torn member"""
+    complete = complete_segment_length(path) if os.path.exists(path) else 0
+    with open(path, "ab") as raw:
+        if raw.tell() > complete:
+            raw.truncate(complete)
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            f.write(("\n".join(lines) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+@instrumented
+def archive_transactions(older_than_days=ARCHIVE_AFTER_DAYS, as_of_day=None):
+    """Move transactions returned more than a number of days ago into the archive; returns how many moved"""
+    as_of_day = get_current_day() if as_of_day is None else as_of_day
+    with shared_lock:
+        cutoff = max(as_of_day - older_than_days, archive_state["archived_before"])
+        moving = transactions.returned_before(cutoff)
+        record_scan(len(transactions.status_column), len(moving))
+        if not moving:
+            return 0
+        
+        # Segments first: until the state below is saved, readers ignore these lines
+        segments: Dict[str, List[str]] = {}
+        for trans_id in moving:
+            trans = transactions[trans_id]
+            segments.setdefault(archive_segment_file(trans['return_date']), []).append(
+                json.dumps(dict(trans, transaction_id=trans_id)))
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        for path, lines in segments.items():
+            append_archive_segment(path, lines)
+        
+        # Then the totals and cutoff, which make the moved transactions count as archived
+        for trans_id in moving:
+            trans = transactions[trans_id]
+            archived = archive_state["students"].setdefault(
+                trans['student_id'], {"name": trans['student_name'], "total_loans": 0, "total_fines": 0.0})
+            archived["total_loans"] += 1
+            archived["total_fines"] += trans['fine']
+            archive_state["fines"] += trans['fine']
+        archive_state["transactions"] += len(moving)
+        archive_state["archived_before"] = cutoff
+        write_archive_state()
+        data_changed()
+        
+        # Finally drop them from memory and storage, then close up the rows they leave behind
+        for trans_id in moving:
+            del transactions[trans_id]
+        log_mutation(*[("transaction", trans_id, None) for trans_id in moving])
+        sync_log()
+        transactions.compact()
+    return len(moving)
+
+def iter_archive(start_day=None, end_day=None):
+    """Stream archived (transaction_id, transaction) pairs returned between two days, oldest month first"""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return
+    first_month = format_day(start_day)[:7] if start_day is not None else ""
+    last_month = format_day(end_day)[:7] if end_day is not None else "9999-99"
+    
+    for name in sorted(os.listdir(ARCHIVE_DIR)):
+        if not name.endswith(".jsonl.gz") or not first_month <= name[:7] <= last_month:
+            continue
+        seen = set()
+        with gzip.open(os.path.join(ARCHIVE_DIR, name), "rt") as f:
+            try:
+                for line in f:
+                    trans = json.loads(line)
+                    trans_id = trans.pop("transaction_id")
+                    # Skip lines repeated or left unconfirmed by an interrupted archive run
+                    if trans_id in seen or trans['return_date'] >= archive_state["archived_before"]:
+                        continue
+                    seen.add(trans_id)
+                    if ((start_day is None or trans['return_date'] >= start_day)
+                            and (end_day is None or trans['return_date'] <= end_day)):
+                        yield trans_id, trans
+            except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError):
+                continue  # Torn write at the end of the segment
+
+def archive_old_returns():
+    """Interactive archival of old returned transactions"""
+    print("\n=== ARCHIVE OLD RETURNS ===")
+    
+    age_input = input(f"Archive returns older than how many days? [{ARCHIVE_AFTER_DAYS}]: ").strip()
+    if age_input and not age_input.isdigit():
+        print("Please enter a whole number of days!")
+        return
+    
+    moved = archive_transactions(int(age_input) if age_input else ARCHIVE_AFTER_DAYS)
+    print(f"Archived {moved} returned transactions.")
+    print(f"Archive: {archive_state['transactions']} transactions | In memory: {len(transactions)}")
 
 # =============================================================================
 # A. INVENTORY MANAGEMENT MODULE
 # =============================================================================
 
+def new_book_record(title, author, genre, total_copies, pub_year):
+    """Validate the fields of a new book; returns (record, None) or (None, error message)"""
+    try:
+        total_copies = int(str(total_copies).strip())
+        pub_year = int(str(pub_year).strip())
+    except ValueError:
+        return None, "Please enter valid numbers for copies and year!"
+    
+    if total_copies <= 0:
+        return None, "Total copies must be greater than 0!"
+    
+    return {
+        "title": str(title).strip(),
+        "author": str(author).strip(),
+        "genre": str(genre).strip(),
+        "total_copies": total_copies,
+        "available_copies": total_copies,
+        "checkout_count": 0,
+        "publication_year": pub_year
+    }, None
+
+def insert_books(new_books):
+    """Add validated book records to the inventory, indexes and storage in one go"""
+    with shared_lock:
+        books.update(new_books)
+        for book_id, book in new_books.items():
+            index_book(book_id)
+            rank_book(book_id)
+            inventory_totals["total_copies"] += book['total_copies']
+            inventory_totals["available_copies"] += book['available_copies']
+        inventory_totals["total_titles"] = len(books)
+        data_changed()
+        log_mutation(*(("book", book_id, book) for book_id, book in new_books.items()))
+
+@instrumented
+@commits_log
+def process_add_book(book_id, title, author, genre, total_copies, pub_year):
+    """Add a book; returns (True, None) or (False, error message)"""
+    book_id = str(book_id).strip().upper()
+    if not book_id:
+        return False, "Book ID cannot be empty!"
+    
+    record, error = new_book_record(title, author, genre, total_copies, pub_year)
+    if error:
+        return False, error
+    
+    with shared_lock:
+        if book_exists(book_id):
+            return False, f"Book with ID {book_id} already exists!"
+        insert_books({book_id: record})
+    return True, None
+
 def add_book():
     """Add a new book to the inventory"""
     print("\n=== ADD NEW BOOK ===")
@@ -119,31 +1244,69 @@ def add_book():
     title = input("Enter book title: ").strip()
     author = input("Enter author name: ").strip()
     genre = input("Enter genre: ").strip()
+    total_copies = input("Enter total copies: ").strip()
+    pub_year = input("Enter publication year: ").strip()
     
-    try:
-        total_copies = int(input("Enter total copies: ").strip())
-        pub_year = int(input("Enter publication year: ").strip())
-        
-        if total_copies <= 0:
-            print("Total copies must be greater than 0!")
-            return
-            
-    except ValueError:
-        print("Please enter valid numbers for copies and year!")
+    success, error = process_add_book(book_id, title, author, genre, total_copies, pub_year)
+    if not success:
+        print(error)
         return
     
-    books[book_id] = {
-        "title": title,
-        "author": author,
-        "genre": genre,
-        "total_copies": total_copies,
-        "available_copies": total_copies,
-        "checkout_count": 0,
-        "publication_year": pub_year
-    }
-    
     print(f"Book '{title}' added successfully with ID: {book_id}")
 
+@instrumented
+@commits_log
+def process_book_update(book_id, title="", author="", genre="", total_copies="", publication_year=""):
+    """Update a book, keeping any field given as blank; returns (True, None) or (False, error message)"""
+    if not book_exists(book_id):
+        return False, f"Book with ID {book_id} not found!"
+    
+    with get_lock(book_locks, book_id):
+        book = books[book_id]
+        
+        # Coerce and validate everything before changing anything, so a bad value leaves the book untouched
+        text_fields = {"title": str(title).strip(), "author": str(author).strip(), "genre": str(genre).strip()}
+        copies = None
+        if str(total_copies).strip():
+            try:
+                copies = int(str(total_copies).strip())
+            except ValueError:
+                return False, "Invalid number for copies!"
+            if copies < book['total_copies'] - book['available_copies']:
+                return False, "Total copies cannot be less than currently borrowed books!"
+            if copies < book['total_copies'] - book['available_copies'] + held_copies(book_id):
+                return False, "Total copies cannot be less than borrowed books plus copies held for pickup!"
+        year = None
+        if str(publication_year).strip():
+            try:
+                year = int(str(publication_year).strip())
+            except ValueError:
+                return False, "Invalid year!"
+        
+        # Update only if new values provided
+        with shared_lock:
+            unindex_book(book_id)
+            unrank_book(book_id)
+            for field, value in text_fields.items():
+                if value:
+                    book[field] = value
+            index_book(book_id)
+            rank_book(book_id)
+            if copies is not None:
+                # New or removed copies are on the shelf, so availability moves with the total
+                added_copies = copies - book['total_copies']
+                book['total_copies'] = copies
+                book['available_copies'] += added_copies
+                inventory_totals["total_copies"] += added_copies
+                inventory_totals["available_copies"] += added_copies
+            if year is not None:
+                book['publication_year'] = year
+            data_changed()
+            # Added copies go to the hold queue first
+            log_mutation(("book", book_id, book), *dispatch_holds(book_id, get_current_day()))
+    
+    return True, None
+
 def update_book():
     """Update existing book information"""
     print("\n=== UPDATE BOOK ===")
@@ -170,35 +1333,15 @@ def update_book():
     new_copies = input(f"New total copies [{book['total_copies']}]: ").strip()
     new_year = input(f"New publication year [{book['publication_year']}]: ").strip()
     
-    # Update only if new values provided
-    if new_title:
-        book['title'] = new_title
-    if new_author:
-        book['author'] = new_author
-    if new_genre:
-        book['genre'] = new_genre
-    if new_copies:
-        try:
-            copies = int(new_copies)
-            if copies >= book['total_copies'] - book['available_copies']:
-                book['total_copies'] = copies
-            else:
-                print("Total copies cannot be less than currently borrowed books!")
-                return
-        except ValueError:
-            print("Invalid number for copies!")
-            return
-    if new_year:
-        try:
-            book['publication_year'] = int(new_year)
-        except ValueError:
-            print("Invalid year!")
-            return
+    success, error = process_book_update(book_id, new_title, new_author, new_genre, new_copies, new_year)
+    if not success:
+        print(error)
+        return
     
     print("Book updated successfully!")
 
 def display_all_books():
-    """Display all books in the inventory"""
+    """Display the books in the inventory a page at a time"""
     print("\n" + "="*100)
     print("                                    LIBRARY INVENTORY")
     print("="*100)
@@ -209,13 +1352,80 @@ def display_all_books():
         print("No books in inventory!")
         return
     
-    for book_id, book in books.items():
-        borrowed = book['total_copies'] - book['available_copies']
-        print(f"{book_id:<6} {book['title'][:24]:<25} {book['author'][:19]:<20} "
-              f"{book['genre'][:14]:<15} {book['total_copies']:<6} {book['available_copies']:<10} {borrowed:<8}")
+    def print_row(book):
+        print(f"{book['book_id']:<6} {book['title'][:24]:<25} {book['author'][:19]:<20} "
+              f"{book['genre'][:14]:<15} {book['total_copies']:<6} {book['available_copies']:<10} "
+              f"{book['borrowed']:<8}")
+    
+    page_through(book_rows, lambda: None, print_row, BOOK_COLUMNS)
     
     print("-"*100)
-    print(f"Total Books: {len(books)} | Total Copies: {sum(b['total_copies'] for b in books.values())}")
+    print(f"Total Books: {len(books)} | Total Copies: {inventory_totals['total_copies']}")
+
+def match_books(field, pattern):
+    """Get IDs of books whose field contains the lowercase pattern"""
+    field_index = search_index[field]
+    postings = sorted((field_index.get(gram, set()) for gram in pattern_grams(pattern)), key=len)
+    
+    matches = set(postings[0])
+    for other in postings[1:]:
+        if not matches:
+            break
+        matches &= other
+    
+    # Grams only prove the pieces are there; longer patterns need a final check
+    if len(pattern) > SEARCH_GRAM_SIZE:
+        matches = {book_id for book_id in matches if pattern in books[book_id][field].lower()}
+    return matches
+
+def match_score(text, pattern):
+    """Score how well a pattern matches a field: exact > whole word > word prefix > substring"""
+    if text == pattern:
+        return 4
+    words = text.split()
+    if pattern in words:
+        return 3
+    if any(word.startswith(pattern) for word in words):
+        return 2
+    return 1
+
+@instrumented
+def find_books(title=None, author=None, genre=None, match_words=False, limit=None):
+    """Find books matching every given field, best matches first
+    
+    Each field matches as a substring of the search term, or with
+    match_words=True every word of the term must appear somewhere in the field.
+    Returns a list of (book_id, score) tuples.
+    """
+    patterns = []
+    for field, term in (("title", title), ("author", author), ("genre", genre)):
+        term = (term or "").strip().lower()
+        if not term:
+            continue
+        for pattern in (term.split() if match_words else [term]):
+            patterns.append((field, pattern))
+    
+    if not patterns:
+        return []
+    
+    # Intersect the smallest candidate sets first
+    candidate_sets = sorted((match_books(field, pattern) for field, pattern in patterns), key=len)
+    matches = candidate_sets[0]
+    for other in candidate_sets[1:]:
+        if not matches:
+            break
+        matches = matches & other
+    
+    ranked = []
+    for book_id in matches:
+        book = books[book_id]
+        score = sum(match_score(book[field].lower(), pattern) for field, pattern in patterns)
+        ranked.append((book_id, score))
+    
+    ranked.sort(key=lambda x: (-x[1], -books[x[0]]['checkout_count'], x[0]))
+    ranked = ranked[:limit] if limit else ranked
+    record_scan(sum(len(candidates) for candidates in candidate_sets), len(ranked))
+    return ranked
 
 def search_books():
     """Search books by title, author, or genre"""
@@ -223,6 +1433,7 @@ def search_books():
     print("1. Search by Title")
     print("2. Search by Author")
     print("3. Search by Genre")
+    print("4. Search by Multiple Fields")
     
     try:
         choice = int(input("Choose search type: ").strip())
@@ -230,25 +1441,25 @@ def search_books():
         print("Invalid choice!")
         return
     
-    if choice not in [1, 2, 3]:
+    if choice not in [1, 2, 3, 4]:
         print("Invalid choice!")
         return
     
-    search_term = input("Enter search term: ").strip().lower()
-    
-    if not search_term:
+    if choice == 4:
+        print("Leave a field blank to ignore it; all filled-in fields must match.")
+        criteria = {
+            "title": input("Title contains: ").strip(),
+            "author": input("Author contains: ").strip(),
+            "genre": input("Genre contains: ").strip()
+        }
+    else:
+        criteria = {SEARCH_FIELDS[choice - 1]: input("Enter search term: ").strip()}
+    
+    if not any(criteria.values()):
         print("Search term cannot be empty!")
         return
     
-    found_books = []
-    
-    for book_id, book in books.items():
-        if choice == 1 and search_term in book['title'].lower():
-            found_books.append((book_id, book))
-        elif choice == 2 and search_term in book['author'].lower():
-            found_books.append((book_id, book))
-        elif choice == 3 and search_term in book['genre'].lower():
-            found_books.append((book_id, book))
+    found_books = [(book_id, books[book_id]) for book_id, score in find_books(**criteria)]
     
     if not found_books:
         print("No books found matching your search!")
@@ -262,62 +1473,443 @@ def search_books():
     for book_id, book in found_books:
         print(f"{book_id:<6} {book['title'][:24]:<25} {book['author'][:19]:<20} {book['available_copies']:<10}")
 
+def read_import_rows(path):
+    """Stream (line_number, row) pairs from a CSV or JSONL file one row at a time"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                yield line_number, row
+
+@instrumented
+@commits_log
+def import_books(path, batch_size=IMPORT_BATCH_SIZE):
+    """Import books from a CSV or JSONL file, validating rows like add_book
+    
+    Rows need book_id, title, author, genre, total_copies and
+    publication_year. Invalid rows are skipped and reported; valid rows are
+    inserted batch_size at a time. Returns a dict with imported/rejected
+    counts and up to IMPORT_ERROR_LIMIT (line_number, message) errors.
+    """
+    report = {"imported": 0, "rejected": 0, "errors": []}
+    batch = {}
+    
+    def reject(line_number, message):
+        report["rejected"] += 1
+        if len(report["errors"]) < IMPORT_ERROR_LIMIT:
+            report["errors"].append((line_number, message))
+    
+    for line_number, row in read_import_rows(path):
+        if not isinstance(row, dict):
+            reject(line_number, "Row is not a valid record!")
+            continue
+        
+        missing = [field for field in ("book_id", "title", "author", "genre", "total_copies", "publication_year")
+                   if row.get(field) is None]
+        if missing:
+            reject(line_number, f"Missing fields: {', '.join(missing)}")
+            continue
+        
+        book_id = str(row["book_id"]).strip().upper()
+        if not book_id:
+            reject(line_number, "Book ID cannot be empty!")
+            continue
+        if book_exists(book_id) or book_id in batch:
+            reject(line_number, f"Book with ID {book_id} already exists!")
+            continue
+        
+        record, error = new_book_record(row["title"], row["author"], row["genre"],
+                                        row["total_copies"], row["publication_year"])
+        if error:
+            reject(line_number, error)
+            continue
+        
+        batch[book_id] = record
+        if len(batch) >= batch_size:
+            insert_books(batch)
+            report["imported"] += len(batch)
+            batch = {}
+    
+    if batch:
+        insert_books(batch)
+        report["imported"] += len(batch)
+    
+    record_scan(report["imported"] + report["rejected"], report["imported"])
+    return report
+
+def bulk_import_books():
+    """Import books from a CSV or JSONL file"""
+    print("\n=== BULK IMPORT BOOKS ===")
+    
+    path = input("Enter path to .csv or .jsonl file: ").strip()
+    
+    if not os.path.isfile(path):
+        print(f"File {path} not found!")
+        return
+    
+    report = import_books(path)
+    
+    print(f"Imported: {report['imported']} | Rejected: {report['rejected']}")
+    if report["errors"]:
+        print("-"*60)
+        for line_number, message in report["errors"][:20]:
+            print(f"Line {line_number}: {message}")
+        if report["rejected"] > 20:
+            print(f"... and {report['rejected'] - 20} more")
+
 # =============================================================================
 # B. ORDER PROCESSING MODULE
 # =============================================================================
 
-def checkout_book():
-    """Process book checkout"""
-    print("\n=== CHECKOUT BOOK ===")
-    
-    student_id = input("Enter Student ID: ").strip().upper()
-    student_name = input("Enter Student Name: ").strip()
-    book_id = input("Enter Book ID: ").strip().upper()
-    
+def checkout_error(student_id, student_name, book_id, loan_count=None, available=None, filled=()):
+    """Get the reason a checkout cannot go ahead, or None if it can
+    
+    loan_count and available default to the student's and book's current
+    figures; the batch API passes its own projected values instead, along
+    with the hold keys filled earlier in the batch. Call under shared_lock,
+    which dispatch_holds also runs under, so no copy is set aside between
+    the check and the checkout.
+    """
     if not student_id or not student_name or not book_id:
-        print("All fields are required!")
-        return
+        return "All fields are required!"
     
     # Check if book exists
     if not book_exists(book_id):
-        print(f"Book with ID {book_id} not found!")
-        return
-    
-    # Check if book is available
-    if books[book_id]['available_copies'] <= 0:
-        print(f"Book '{books[book_id]['title']}' is not available for checkout!")
-        return
-    
-    # Check student's current loans
-    active_loans = get_student_active_loans(student_id)
-    if active_loans >= MAX_BOOKS_PER_STUDENT:
-        print(f"Student has reached maximum loan limit of {MAX_BOOKS_PER_STUDENT} books!")
-        return
-    
-    # Process checkout
-    transaction_id = generate_transaction_id()
-    checkout_date = get_current_date()
-    due_date = (datetime.now() + timedelta(days=LOAN_PERIOD_DAYS)).strftime("%Y-%m-%d")
-    
+        return f"Book with ID {book_id} not found!"
+    
+    # Check if book is available; copies set aside for holds only go to their holders
+    if available is None:
+        available = books[book_id]['available_copies']
+    available -= held_copies(book_id)
+    key = hold_key(book_id, student_id)
+    hold = holds.get(key)
+    own_copy = hold is not None and hold['status'] == 'ready' and key not in filled
+    if own_copy:
+        available += 1
+    if available <= 0:
+        return f"Book '{books[book_id]['title']}' is not available for checkout!"
+    
+    # Check student's current loans; copies set aside for them on other books count too
+    if loan_count is None:
+        loan_count = get_student_active_loans(student_id)
+    if loan_count + student_ready_holds.get(student_id, 0) - own_copy >= MAX_BOOKS_PER_STUDENT:
+        return f"Student has reached maximum loan limit of {MAX_BOOKS_PER_STUDENT} books!"
+    
+    return None
+
+def return_error(transaction_id):
+    """Get the reason a return cannot go ahead, or None if it can"""
+    if transaction_id not in transactions:
+        return "Transaction ID not found!"
+    if transactions[transaction_id]['status'] == 'returned':
+        return "This book has already been returned!"
+    return None
+
+def apply_checkout(transaction_id, student_id, student_name, book_id, checkout_date):
+    """Record an already validated checkout; returns the changes to log"""
     transactions[transaction_id] = {
         "book_id": book_id,
         "student_id": student_id,
         "student_name": student_name,
         "checkout_date": checkout_date,
-        "due_date": due_date,
+        "due_date": checkout_date + LOAN_PERIOD_DAYS,
         "return_date": None,
         "fine": 0.0,
         "status": "borrowed"
     }
+    index_open_loan(transaction_id, transactions[transaction_id])
+    record_student_checkout(transactions[transaction_id])
     
     # Update book availability
     books[book_id]['available_copies'] -= 1
+    inventory_totals["available_copies"] -= 1
+    unrank_book(book_id)
     books[book_id]['checkout_count'] += 1
+    rank_book(book_id)
+    data_changed()
+    
+    changes = [("transaction", transaction_id, transactions[transaction_id]), ("book", book_id, books[book_id])]
+    # The student's hold on the book is filled, using the copy set aside if there was one
+    if hold_key(book_id, student_id) in holds:
+        changes.append(release_hold(hold_key(book_id, student_id)))
+    return changes
+
+def apply_return(transaction_id, return_date):
+    """Record an already validated return; returns the changes to log"""
+    transaction = transactions[transaction_id]
+    book_id = transaction['book_id']
+    
+    # Calculate fine if overdue
+    days_overdue = return_date - transaction['due_date']
+    fine = days_overdue * FINE_PER_DAY if days_overdue > 0 else 0.0
+    
+    # Update transaction
+    transaction['return_date'] = return_date
+    transaction['fine'] = fine
+    transaction['status'] = 'returned'
+    unindex_open_loan(transaction_id, transaction)
+    record_student_return(transaction)
+    
+    # Update book availability
+    books[book_id]['available_copies'] += 1
+    inventory_totals["available_copies"] += 1
+    data_changed()
+    return [("transaction", transaction_id, transaction), ("book", book_id, books[book_id])] + \
+        dispatch_holds(book_id, return_date)
+
+def dispatch_holds(book_id, today):
+    """Set free copies of a book aside for the next eligible holders in its queue; returns the changes to log
+    
+    A holder already at MAX_BOOKS_PER_STUDENT, counting loans plus copies
+    set aside for them, keeps their place and is passed over for this copy.
+    Caller holds shared_lock, under which checkouts are checked too.
+    """
+    queue = hold_queues.get(book_id)
+    if not queue:
+        return []
+    changes = []
+    passed_over = []
+    free = books[book_id]['available_copies'] - held_copies(book_id)
+    while free > 0 and queue:
+        queued, key = queue.popleft()
+        hold = current_hold(key, queued)
+        if hold is None or hold['status'] != 'waiting':
+            continue
+        student_id = hold['student_id']
+        if get_student_active_loans(student_id) + student_ready_holds.get(student_id, 0) >= MAX_BOOKS_PER_STUDENT:
+            passed_over.append((queued, key))
+            continue
+        hold['status'] = 'ready'
+        hold['expires'] = today + HOLD_PICKUP_DAYS
+        waiting_holds[book_id] -= 1
+        index_hold(key, hold)
+        changes.append(("hold", key, hold))
+        free -= 1
+    
+    queue.extendleft(reversed(passed_over))
+    if not queue:
+        del hold_queues[book_id]
+    return changes
+
+def expire_holds(today):
+    """Drop holds whose expiry day has passed, passing their set-aside copies on; returns the changes to log
+    
+    Only due entries are taken off the hold_expiry heap, so nothing
+    walks the holds that are still current.
+    """
+    changes = []
+    freed_books = []
+    while hold_expiry and hold_expiry[0][0] < today:
+        expires, queued, key = heapq.heappop(hold_expiry)
+        hold = current_hold(key, queued)
+        if hold is None or hold['expires'] != expires:
+            continue  # Filled, lapsed or moved to the shelf since this entry was pushed
+        if hold['status'] == 'ready':
+            freed_books.append(hold['book_id'])
+        changes.append(release_hold(key))
+    for book_id in freed_books:
+        changes.extend(dispatch_holds(book_id, today))
+    return changes
+
+def expire_due_holds():
+    """Expire any holds that are past their day, if the heap says some are"""
+    today = get_current_day()
+    if hold_expiry and hold_expiry[0][0] < today:
+        with shared_lock:
+            changes = expire_holds(today)
+            if changes:
+                log_mutation(*changes)
+
+@instrumented
+@commits_log
+def process_checkout(student_id, student_name, book_id):
+    """Check a book out; returns (True, transaction_id) or (False, error message)"""
+    expire_due_holds()
+    with get_lock(student_locks, student_id), get_lock(book_locks, book_id), shared_lock:
+        error = checkout_error(student_id, student_name, book_id)
+        if error:
+            return False, error
+        
+        transaction_id = generate_transaction_id()
+        log_mutation(*apply_checkout(transaction_id, student_id, student_name, book_id, get_current_day()))
+    return True, transaction_id
+
+@instrumented
+@commits_log
+def process_return(transaction_id):
+    """Check a book back in; returns (True, fine) or (False, error message)"""
+    expire_due_holds()
+    transaction = transactions.get(transaction_id)
+    if transaction is None:
+        return False, "Transaction ID not found!"
+    
+    with get_lock(student_locks, transaction['student_id']), get_lock(book_locks, transaction['book_id']):
+        error = return_error(transaction_id)
+        if error:
+            return False, error
+        
+        with shared_lock:
+            log_mutation(*apply_return(transaction_id, get_current_day()))
+            fine = transaction['fine']
+    return True, fine
+
+@instrumented
+@commits_log
+def process_batch(operations, atomic=False):
+    """Validate and apply many checkouts and returns together
+    
+    Each operation is a dict: {"action": "checkout", "student_id",
+    "student_name", "book_id"} or {"action": "return", "transaction_id"}.
+    Operations are checked in order against one projected view of copies
+    and loan counts, so a return earlier in the batch frees a copy or a
+    loan slot for a later checkout. With atomic=True nothing is applied
+    unless every operation is valid. Returns one result dict per
+    operation with "ok" plus "transaction_id", "fine" or "error".
+    """
+    expire_due_holds()
+    
+    # Normalise IDs up front so every book and student involved can be locked
+    # in one fixed order (all students, then all books, each sorted)
+    normalised = []
+    student_ids = set()
+    book_ids = set()
+    for operation in operations:
+        action = operation.get("action")
+        if action == "checkout":
+            student_id = str(operation.get("student_id", "")).strip().upper()
+            book_id = str(operation.get("book_id", "")).strip().upper()
+            normalised.append((action, student_id, str(operation.get("student_name", "")).strip(), book_id))
+            student_ids.add(student_id)
+            book_ids.add(book_id)
+        elif action == "return":
+            transaction_id = str(operation.get("transaction_id", "")).strip().upper()
+            normalised.append((action, transaction_id))
+            transaction = transactions.get(transaction_id)
+            if transaction is not None:
+                student_ids.add(transaction['student_id'])
+                book_ids.add(transaction['book_id'])
+        else:
+            normalised.append((action,))
+    
+    with ExitStack() as held_locks:
+        for student_id in sorted(student_ids):
+            held_locks.enter_context(get_lock(student_locks, student_id))
+        for book_id in sorted(book_ids):
+            held_locks.enter_context(get_lock(book_locks, book_id))
+        with shared_lock:
+            return apply_batch(normalised, atomic)
+
+def apply_batch(operations, atomic):
+    """Validate and apply normalised batch operations (caller holds the locks, shared_lock included)"""
+    projected_copies = {}  # book_id -> available copies after the operations so far
+    projected_loans = {}  # student_id -> active loans after the operations so far, less holds filled
+    filled = set()  # keys of ready holds the checkouts so far will fill
+    returning = set()
+    results = []
+    accepted = []
+    
+    for operation in operations:
+        action = operation[0]
+        result = {"action": action, "ok": False}
+        results.append(result)
+        
+        if action == "checkout":
+            _, student_id, student_name, book_id = operation
+            loan_count = projected_loans.get(student_id)
+            if loan_count is None:
+                loan_count = get_student_active_loans(student_id)
+            
+            error = checkout_error(student_id, student_name, book_id, loan_count, projected_copies.get(book_id), filled)
+            if error:
+                result["error"] = error
+                continue
+            projected_copies[book_id] = projected_copies.get(book_id, books[book_id]['available_copies']) - 1
+            # A filled hold stops counting toward the limit (its copy becomes the loan)
+            key = hold_key(book_id, student_id)
+            hold = holds.get(key)
+            if hold is not None and hold['status'] == 'ready' and key not in filled:
+                filled.add(key)
+                loan_count -= 1
+            projected_loans[student_id] = loan_count + 1
+            accepted.append((result, (student_id, student_name, book_id)))
+        
+        elif action == "return":
+            transaction_id = operation[1]
+            error = return_error(transaction_id)
+            if not error and transaction_id in returning:
+                error = "This book has already been returned!"
+            if error:
+                result["error"] = error
+                continue
+            transaction = transactions[transaction_id]
+            book_id = transaction['book_id']
+            student_id = transaction['student_id']
+            returning.add(transaction_id)
+            # A copy returned to a book with a hold queue may go to a holder, so later checkouts cannot count on it
+            projected_copies[book_id] = projected_copies.get(book_id, books[book_id]['available_copies']) + \
+                (0 if hold_queues.get(book_id) else 1)
+            projected_loans[student_id] = projected_loans.get(student_id, get_student_active_loans(student_id)) - 1
+            accepted.append((result, transaction_id))
+        
+        else:
+            result["error"] = f"Unknown action: {action}"
+    
+    if atomic and len(accepted) < len(results):
+        for result, _ in accepted:
+            result["error"] = "Batch rejected: another operation in it failed"
+        return results
+    
+    # One ID block, one date lookup and one log write for the whole batch
+    checkout_count = sum(1 for _, target in accepted if isinstance(target, tuple))
+    new_ids = iter(reserve_transaction_ids(checkout_count)) if checkout_count else iter(())
+    today = get_current_day()
+    changes = []
+    
+    for result, target in accepted:
+        if isinstance(target, tuple):
+            transaction_id = next(new_ids)
+            changes.extend(apply_checkout(transaction_id, *target, today))
+            result["transaction_id"] = transaction_id
+        else:
+            changes.extend(apply_return(target, today))
+            result["transaction_id"] = target
+            result["fine"] = transactions[target]['fine']
+        result["ok"] = True
+    
+    if changes:
+        log_mutation(*changes)
+    return results
+
+def checkout_book():
+    """Process book checkout"""
+    print("\n=== CHECKOUT BOOK ===")
+    
+    student_id = input("Enter Student ID: ").strip().upper()
+    student_name = input("Enter Student Name: ").strip()
+    book_id = input("Enter Book ID: ").strip().upper()
     
+    success, result = process_checkout(student_id, student_name, book_id)
+    if not success:
+        print(result)
+        if result.endswith("is not available for checkout!") and \
+                input("Place a hold on this book? (y/n): ").strip().lower() == "y":
+            place_hold(student_id, student_name, book_id)
+        return
+    
+    transaction = transactions[result]
     print(f"\nCheckout successful!")
-    print(f"Transaction ID: {transaction_id}")
+    print(f"Transaction ID: {result}")
     print(f"Book: {books[book_id]['title']}")
-    print(f"Due Date: {due_date}")
+    print(f"Due Date: {format_day(transaction['due_date'])}")
     print(f"Student: {student_name} ({student_id})")
 
 def return_book():
@@ -326,200 +1918,767 @@ def return_book():
     
     transaction_id = input("Enter Transaction ID: ").strip().upper()
     
-    if transaction_id not in transactions:
-        print("Transaction ID not found!")
+    book_id = transactions[transaction_id]['book_id'] if transaction_id in transactions else None
+    set_aside = held_copies(book_id) if book_id else 0
+    success, result = process_return(transaction_id)
+    if not success:
+        print(result)
         return
     
     transaction = transactions[transaction_id]
+    fine = result
+    if fine > 0:
+        print(f"Book is {transaction['return_date'] - transaction['due_date']} days overdue!")
+        print(f"Fine amount: ${fine:.2f}")
+    
+    print(f"\nReturn processed successfully!")
+    print(f"Book: {books[transaction['book_id']]['title']}")
+    print(f"Student: {transaction['student_name']}")
+    print(f"Return Date: {format_day(transaction['return_date'])}")
+    if fine > 0:
+        print(f"Fine: ${fine:.2f}")
+    if held_copies(book_id) > set_aside:
+        print("This copy is now set aside for the next student in the hold queue.")
+
+def batch_desk_session():
+    """Enter many checkouts and returns, then process them together"""
+    print("\n=== BATCH CHECKOUT / RETURN ===")
+    print("One operation per line, blank line to finish:")
+    print("  checkout <student_id> <book_id> <student name>")
+    print("  return <transaction_id>")
+    
+    operations = []
+    while True:
+        line = input("> ").strip()
+        if not line:
+            break
+        parts = line.split(maxsplit=3)
+        if parts[0].lower() == "checkout" and len(parts) == 4:
+            operations.append({"action": "checkout", "student_id": parts[1],
+                               "book_id": parts[2], "student_name": parts[3]})
+        elif parts[0].lower() == "return" and len(parts) == 2:
+            operations.append({"action": "return", "transaction_id": parts[1]})
+        else:
+            print("Could not read that line, skipped.")
     
-    if transaction['status'] == 'returned':
-        print("This book has already been returned!")
+    if not operations:
+        print("No operations entered!")
         return
     
-    book_id = transaction['book_id']
-    return_date = get_current_date()
+    atomic = input("All or nothing? (y/n): ").strip().lower() == "y"
+    results = process_batch(operations, atomic)
     
-    # Calculate fine if overdue
-    fine = 0.0
-    days_overdue = calculate_days_difference(transaction['due_date'], return_date)
+    print("-"*70)
+    for number, result in enumerate(results, 1):
+        if result["ok"]:
+            detail = result["transaction_id"]
+            if result.get("fine"):
+                detail += f" (fine ${result['fine']:.2f})"
+            print(f"{number:<4} {result['action']:<9} OK     {detail}")
+        else:
+            print(f"{number:<4} {str(result['action']):<9} FAILED {result['error']}")
+    print("-"*70)
+    print(f"Processed: {sum(1 for r in results if r['ok'])} of {len(results)}")
+
+def view_student_loans():
+    """Display the books a student currently has borrowed"""
+    print("\n=== STUDENT LOANS ===")
     
-    if days_overdue > 0:
-        fine = days_overdue * FINE_PER_DAY
-        print(f"Book is {days_overdue} days overdue!")
-        print(f"Fine amount: ${fine:.2f}")
+    student_id = input("Enter Student ID: ").strip().upper()
+    open_loans = get_student_open_transactions(student_id)
     
-    # Update transaction
-    transaction['return_date'] = return_date
-    transaction['fine'] = fine
-    transaction['status'] = 'returned'
+    if not open_loans:
+        print(f"Student {student_id} has no active loans!")
+        return
     
-    # Update book availability
-    books[book_id]['available_copies'] += 1
+    print(f"{'Trans ID':<8} {'Book Title':<25} {'Checkout':<12} {'Due Date':<12}")
+    print("-"*60)
+    for trans_id, trans in open_loans:
+        book_title = books[trans['book_id']]['title'][:24]
+        print(f"{trans_id:<8} {book_title:<25} {format_day(trans['checkout_date']):<12} "
+              f"{format_day(trans['due_date']):<12}")
     
-    print(f"\nReturn processed successfully!")
+    print("-"*60)
+    print(f"Active Loans: {len(open_loans)} of {MAX_BOOKS_PER_STUDENT}")
+
+@instrumented
+@commits_log
+def process_place_hold(student_id, student_name, book_id):
+    """Queue a student for a book with no free copies; returns (True, place in queue) or (False, error message)"""
+    if not student_id or not student_name or not book_id:
+        return False, "All fields are required!"
+    if not book_exists(book_id):
+        return False, f"Book with ID {book_id} not found!"
+    expire_due_holds()
+    
+    with get_lock(student_locks, student_id), get_lock(book_locks, book_id), shared_lock:
+        key = hold_key(book_id, student_id)
+        if key in holds:
+            if holds[key]['status'] == 'ready':
+                return False, "A copy of this book is already set aside for this student!"
+            return False, "Student is already in the hold queue for this book!"
+        if any(transactions[tid]['book_id'] == book_id for tid in student_open_loans.get(student_id, ())):
+            return False, "Student already has this book on loan!"
+        if books[book_id]['available_copies'] > held_copies(book_id):
+            return False, f"Book '{books[book_id]['title']}' has copies available; check it out instead!"
+        
+        today = get_current_day()
+        holds[key] = {
+            "book_id": book_id,
+            "student_id": student_id,
+            "student_name": student_name,
+            "queued": hold_state["next_queued"],
+            "placed": today,
+            "expires": today + HOLD_EXPIRY_DAYS,
+            "status": "waiting"
+        }
+        index_hold(key, holds[key])
+        log_mutation(("hold", key, holds[key]))
+        return True, waiting_holds[book_id]
+
+@instrumented
+@commits_log
+def hold_queue_data(book_id):
+    """Build a book's holds as a dict: holders with a copy set aside, then the waiting queue in order"""
+    expire_due_holds()
+    with shared_lock:
+        def row(key):
+            hold = holds[key]
+            return {"student_id": hold['student_id'], "student_name": hold['student_name'],
+                    "placed": format_day(hold['placed']), "expires": format_day(hold['expires'])}
+        
+        ready = sorted(ready_holds.get(book_id, ()), key=lambda key: holds[key]['queued'])
+        waiting = [key for queued, key in hold_queues.get(book_id, ())
+                   if current_hold(key, queued) is not None and holds[key]['status'] == 'waiting']
+        record_scan(len(ready) + len(hold_queues.get(book_id, ())), len(ready) + len(waiting))
+        return {"book_id": book_id, "ready": [row(key) for key in ready], "waiting": [row(key) for key in waiting]}
+
+def place_hold(student_id=None, student_name=None, book_id=None):
+    """Put a student in the hold queue for a book"""
+    if book_id is None:
+        print("\n=== PLACE HOLD ===")
+        student_id = input("Enter Student ID: ").strip().upper()
+        student_name = input("Enter Student Name: ").strip()
+        book_id = input("Enter Book ID: ").strip().upper()
+    
+    success, result = process_place_hold(student_id, student_name, book_id)
+    if not success:
+        print(result)
+        return
+    
+    print(f"\nHold placed! {student_name} ({student_id}) is number {result} in the queue for "
+          f"'{books[book_id]['title']}'.")
+    print(f"A returned copy will be kept for {HOLD_PICKUP_DAYS} days; the hold lapses after {HOLD_EXPIRY_DAYS} days.")
+
+def view_hold_queue():
+    """Show the copies set aside and the waiting queue for a book"""
+    print("\n=== HOLD QUEUE ===")
+    book_id = input("Enter Book ID: ").strip().upper()
+    if not book_exists(book_id):
+        print(f"Book with ID {book_id} not found!")
+        return
+    
+    queue = hold_queue_data(book_id)
     print(f"Book: {books[book_id]['title']}")
-    print(f"Student: {transaction['student_name']}")
-    print(f"Return Date: {return_date}")
-    if fine > 0:
-        print(f"Fine: ${fine:.2f}")
+    if not queue['ready'] and not queue['waiting']:
+        print("No holds on this book.")
+        return
+    
+    print(f"\n{'#':<4} {'Student ID':<12} {'Name':<20} {'Status':<22} {'Until':<12}")
+    print("-"*72)
+    for holder in queue['ready']:
+        print(f"{'-':<4} {holder['student_id']:<12} {holder['student_name'][:19]:<20} "
+              f"{'Copy ready for pickup':<22} {holder['expires']:<12}")
+    for position, holder in enumerate(queue['waiting'], 1):
+        print(f"{position:<4} {holder['student_id']:<12} {holder['student_name'][:19]:<20} "
+              f"{'Waiting':<22} {holder['expires']:<12}")
+
+OVERDUE_COLUMNS = ("transaction_id", "book_title", "student_id", "student_name", "due_date", "days_overdue", "fine")
+
+def overdue_rows(cursor=None, as_of_day=None):
+    """Yield (cursor, row) for loans overdue on a day, oldest first, resuming after a cursor
+    
+    The cursor is "due_day:transaction_id" of the last row seen, so it
+    stays valid while loans are checked out and returned between pages.
+    The generator finds its place again the same way after every row, so
+    it can also be kept paused across pages.
+    """
+    as_of_day = get_current_day() if as_of_day is None else as_of_day
+    last = (-1, "")
+    if cursor:
+        due_day, _, trans_id = cursor.partition(":")
+        last = (int(due_day), trans_id)
+    if storage["db"] is not None:
+        yield from database_overdue_rows(last, as_of_day)
+        return
+    
+    while True:
+        position = bisect_right(loans_by_due_date, last)
+        if position == len(loans_by_due_date) or loans_by_due_date[position][0] >= as_of_day:
+            return
+        due_day, trans_id = last = loans_by_due_date[position]
+        trans = transactions[trans_id]
+        yield overdue_row(trans_id, due_day, trans['student_id'], trans['student_name'],
+                          books[trans['book_id']]['title'], as_of_day)
+
+def database_overdue_rows(last, as_of_day):
+    """overdue_rows read from the database's (status, due_date) index, a page of rows per query"""
+    while True:
+        rows = storage["db"].overdue_loans(as_of_day, last, REPORT_PAGE_SIZE)
+        for trans_id, due_day, student_id, student_name, title in rows:
+            last = (due_day, trans_id)
+            yield overdue_row(trans_id, due_day, student_id, student_name, title, as_of_day)
+        if len(rows) < REPORT_PAGE_SIZE:
+            return
+
+def overdue_row(trans_id, due_day, student_id, student_name, title, as_of_day):
+    """Build the (cursor, row) pair overdue_rows yields for one loan"""
+    days_late = as_of_day - due_day
+    return f"{due_day}:{trans_id}", {
+        "transaction_id": trans_id, "book_title": title, "student_id": student_id, "student_name": student_name,
+        "due_date": format_day(due_day), "days_overdue": days_late, "fine": days_late * FINE_PER_DAY
+    }
+
+@instrumented
+@cached_report(dated=True)
+def overdue_books_data(cursor=None, page_size=REPORT_PAGE_SIZE):
+    """Build one page of the overdue books list as a dict"""
+    with shared_lock:
+        today = get_current_day()
+        overdue, next_cursor = take_page(overdue_rows(cursor, today), page_size)
+        record_scan(len(overdue), len(overdue))
+        if storage["db"] is not None:
+            overdue_count, days_overdue = storage["db"].overdue_totals(today)
+            total_fines = days_overdue * FINE_PER_DAY
+        else:
+            overdue_count, total_fines = count_overdue_loans(today), calculate_pending_fines(today)
+        return {"overdue": overdue, "next_cursor": next_cursor, "overdue_count": overdue_count,
+                "total_fines": total_fines}
 
 def view_overdue_books():
-    """Display all overdue books"""
+    """Display overdue books a page at a time"""
     print("\n=== OVERDUE BOOKS ===")
-    current_date = get_current_date()
+    today = get_current_day()
     
-    overdue_transactions = []
+    def print_header():
+        print(f"{'Trans ID':<8} {'Book Title':<25} {'Student':<20} {'Days Late':<10} {'Fine':<8}")
+        print("-"*80)
     
-    for trans_id, trans in transactions.items():
-        if trans['status'] == 'borrowed':
-            days_overdue = calculate_days_difference(trans['due_date'], current_date)
-            if days_overdue > 0:
-                fine = days_overdue * FINE_PER_DAY
-                overdue_transactions.append((trans_id, trans, days_overdue, fine))
+    def print_row(loan):
+        print(f"{loan['transaction_id']:<8} {loan['book_title'][:24]:<25} {loan['student_name'][:19]:<20} "
+              f"{loan['days_overdue']:<10} ${loan['fine']:<7.2f}")
     
-    if not overdue_transactions:
+    shown = page_through(lambda cursor: overdue_rows(cursor, today), print_header, print_row, OVERDUE_COLUMNS)
+    if not shown:
         print("No overdue books!")
         return
     
-    print(f"{'Trans ID':<8} {'Book Title':<25} {'Student':<20} {'Days Late':<10} {'Fine':<8}")
     print("-"*80)
-    
-    total_fines = 0.0
-    for trans_id, trans, days_late, fine in overdue_transactions:
-        book_title = books[trans['book_id']]['title'][:24]
-        student_name = trans['student_name'][:19]
-        print(f"{trans_id:<8} {book_title:<25} {student_name:<20} {days_late:<10} ${fine:<7.2f}")
-        total_fines += fine
-    
-    print("-"*80)
-    print(f"Total Overdue Books: {len(overdue_transactions)} | Total Fines: ${total_fines:.2f}")
+    print(f"Total Overdue Books: {count_overdue_loans(today)} | Total Fines: ${calculate_pending_fines(today):.2f}")
 
 # =============================================================================
 # C. REPORTING MODULE
 # =============================================================================
 
+def take_page(rows, page_size):
+    """Collect up to page_size rows from a (cursor, row) generator; returns (rows, next_cursor)
+    
+    next_cursor is None once the rows have run out.
+    """
+    page = []
+    for cursor, row in rows:
+        page.append(row)
+        if len(page) == page_size:
+            # Only hand back a cursor when there is another row to show
+            return page, cursor if next(rows, None) is not None else None
+    return page, None
+
+def export_rows(make_rows, path, columns):
+    """Stream every row to a .csv or .jsonl file a page at a time; returns how many were written
+    
+    make_rows(None) must return a (cursor, row) generator from the start.
+    That one generator is read for the whole export, paused between pages
+    so shared_lock is held only while a page is read; only one page is
+    held in memory.
+    """
+    as_csv = not path.lower().endswith(".jsonl")
+    written = 0
+    rows = make_rows(None)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns) if as_csv else None
+        if writer:
+            writer.writeheader()
+        while True:
+            with shared_lock:
+                page = [row for _, row in islice(rows, EXPORT_PAGE_SIZE)]
+            for row in page:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row) + "\n")
+            written += len(page)
+            if len(page) < EXPORT_PAGE_SIZE:
+                return written
+
+def page_through(make_rows, print_header, print_row, columns):
+    """Print rows REPORT_PAGE_SIZE at a time, offering more pages or an export; returns rows shown"""
+    cursor = None
+    shown = 0
+    while True:
+        with shared_lock:
+            page, cursor = take_page(make_rows(cursor), REPORT_PAGE_SIZE)
+        if page and not shown:
+            print_header()
+        for row in page:
+            print_row(row)
+        shown += len(page)
+        if cursor is None:
+            return shown
+        
+        choice = input("Enter for next page, e to export all rows, q to stop: ").strip().lower()
+        if choice == "q":
+            return shown
+        if choice == "e":
+            path = input("Export file (.csv or .jsonl): ").strip()
+            if not path:
+                print("Export cancelled.")
+                return shown
+            try:
+                print(f"Exported {export_rows(make_rows, path, columns)} rows to {path}")
+            except OSError as e:
+                print(f"Export failed: {e}")
+            return shown
+
+def growing_items(table, start):
+    """Yield (position, key, value) from a position on in a dict that is only ever added to
+    
+    Seeking to the start position is the only skip, however long the walk
+    is paused between rows; if the dict grew meanwhile, the walk seeks back
+    to where it was.
+    """
+    position = start
+    while True:
+        try:
+            for key, value in islice(table.items(), position, None):
+                position += 1
+                yield position - 1, key, value
+            return
+        except RuntimeError:  # dictionary changed size during iteration
+            continue
+
+BOOK_COLUMNS = ("book_id", "title", "author", "genre", "total_copies", "available_copies", "borrowed")
+
+def book_rows(cursor=None, unavailable_only=False):
+    """Yield (cursor, row) for books in catalog order, resuming after a cursor
+    
+    Books are never removed, so the cursor is simply a position in the
+    books dict.
+    """
+    for position, book_id, book in growing_items(books, cursor or 0):
+        if unavailable_only and book['available_copies'] > 0:
+            continue
+        yield position + 1, {
+            "book_id": book_id, "title": book['title'], "author": book['author'], "genre": book['genre'],
+            "total_copies": book['total_copies'], "available_copies": book['available_copies'],
+            "borrowed": book['total_copies'] - book['available_copies']
+        }
+
+@instrumented
+@cached_report(dated=True)
+def inventory_report_data(unavailable_cursor=None, page_size=REPORT_PAGE_SIZE):
+    """Build the inventory report as a dict, with one page of the unavailable books"""
+    with shared_lock:
+        total_copies = inventory_totals["total_copies"]
+        total_available = inventory_totals["available_copies"]
+        total_borrowed = total_copies - total_available
+        
+        available_books = list(islice(((bid, book) for bid, book in books.items() if book['available_copies'] > 0), 10))
+        unavailable_titles = sum(1 for book in books.values() if book['available_copies'] == 0)
+        unavailable_books, next_cursor = take_page(book_rows(unavailable_cursor, unavailable_only=True), page_size)
+        record_scan(len(books), len(available_books) + len(unavailable_books))
+        
+        return {
+            "report_date": get_current_date(),
+            "total_titles": inventory_totals["total_titles"],
+            "total_copies": total_copies,
+            "available_copies": total_available,
+            "borrowed_copies": total_borrowed,
+            "utilization_rate": (total_borrowed / total_copies) * 100 if total_copies > 0 else None,
+            "available_titles": len(books) - unavailable_titles,
+            "available_books": [{"book_id": bid, "title": book['title'], "available_copies": book['available_copies']}
+                                for bid, book in available_books],  # Show top 10
+            "unavailable_titles": unavailable_titles,
+            "unavailable_books": [{"book_id": book['book_id'], "title": book['title']} for book in unavailable_books],
+            "next_cursor": next_cursor
+        }
+
 def inventory_report():
     """Generate real-time inventory report"""
     print("\n" + "="*80)
     print("                           INVENTORY REPORT")
     print("="*80)
     
-    total_books = len(books)
-    total_copies = sum(book['total_copies'] for book in books.values())
-    total_available = sum(book['available_copies'] for book in books.values())
-    total_borrowed = total_copies - total_available
+    report = inventory_report_data()
     
-    print(f"Report Date: {get_current_date()}")
-    print(f"Total Book Titles: {total_books}")
-    print(f"Total Copies: {total_copies}")
-    print(f"Available Copies: {total_available}")
-    print(f"Borrowed Copies: {total_borrowed}")
-    print(f"Utilization Rate: {(total_borrowed/total_copies)*100:.1f}%" if total_copies > 0 else "N/A")
+    print(f"Report Date: {report['report_date']}")
+    print(f"Total Book Titles: {report['total_titles']}")
+    print(f"Total Copies: {report['total_copies']}")
+    print(f"Available Copies: {report['available_copies']}")
+    print(f"Borrowed Copies: {report['borrowed_copies']}")
+    print(f"Utilization Rate: {report['utilization_rate']:.1f}%" if report['utilization_rate'] is not None else "N/A")
     
     print("\n" + "="*80)
     print("BOOKS BY AVAILABILITY STATUS")
     print("="*80)
     
-    available_books = [(bid, book) for bid, book in books.items() if book['available_copies'] > 0]
-    unavailable_books = [(bid, book) for bid, book in books.items() if book['available_copies'] == 0]
-    
-    print(f"\nAvailable Books ({len(available_books)}):")
+    print(f"\nAvailable Books ({report['available_titles']}):")
     print("-"*50)
-    for book_id, book in available_books[:10]:  # Show top 10
-        print(f"{book_id}: {book['title']} - {book['available_copies']} copies")
+    for book in report['available_books']:
+        print(f"{book['book_id']}: {book['title']} - {book['available_copies']} copies")
     
-    if unavailable_books:
-        print(f"\nUnavailable Books ({len(unavailable_books)}):")
-        print("-"*50)
-        for book_id, book in unavailable_books:
-            print(f"{book_id}: {book['title']}")
+    if report['unavailable_titles']:
+        print(f"\nUnavailable Books ({report['unavailable_titles']}):")
+        page_through(lambda cursor: book_rows(cursor, unavailable_only=True), lambda: print("-"*50),
+                     lambda book: print(f"{book['book_id']}: {book['title']}"), BOOK_COLUMNS)
+
+@instrumented
+@cached_report()
+def popular_books_data(limit=10, genre=None):
+    """Build the popular books report as a dict, optionally for one genre"""
+    with shared_lock:
+        if storage["db"] is not None:
+            if limit < 1:
+                raise ValueError("limit must be at least 1")
+            # Indexed on checkout_count and (genre COLLATE NOCASE, checkout_count)
+            genre_name = genre.strip() if genre is not None else None
+            ranked = [{"rank": rank, "book_id": book_id, "title": title, "checkout_count": count, "genre": book_genre}
+                      for rank, (book_id, title, count, book_genre)
+                      in enumerate(storage["db"].popular_books(limit, genre_name), 1)]
+            high_demand_count = storage["db"].count_books_above_checkouts(HIGH_DEMAND_CHECKOUTS, genre_name)
+        else:
+            ranked = [{"rank": rank, "book_id": book_id, "title": books[book_id]['title'],
+                       "checkout_count": books[book_id]['checkout_count'], "genre": books[book_id]['genre']}
+                      for rank, book_id in enumerate(top_books(limit, genre), 1)]
+            high_demand_count = count_books_above_checkouts(HIGH_DEMAND_CHECKOUTS, genre)
+        record_scan(len(ranked), len(ranked))
+        return {
+            "genre": genre,
+            "books": ranked,
+            "high_demand_count": high_demand_count
+        }
 
-def popular_books_report():
+def popular_books_report(genre=None):
     """Generate report of most popular books"""
-    print("\n=== POPULAR BOOKS REPORT ===")
+    print("\n=== POPULAR BOOKS REPORT ===" if genre is None else f"\n=== POPULAR BOOKS: {genre.upper()} ===")
     
-    # Sort books by checkout count
-    popular_books = sorted(books.items(), key=lambda x: x[1]['checkout_count'], reverse=True)
+    report = popular_books_data(genre=genre)
+    if not report['books']:
+        print("No books found for that genre!")
+        return
     
     print(f"{'Rank':<5} {'Book ID':<8} {'Title':<30} {'Checkouts':<10} {'Genre':<15}")
     print("-"*75)
     
-    for i, (book_id, book) in enumerate(popular_books[:10], 1):
-        print(f"{i:<5} {book_id:<8} {book['title'][:29]:<30} {book['checkout_count']:<10} {book['genre'][:14]:<15}")
+    for book in report['books']:
+        print(f"{book['rank']:<5} {book['book_id']:<8} {book['title'][:29]:<30} "
+              f"{book['checkout_count']:<10} {book['genre'][:14]:<15}")
     
     # High demand alert
-    high_demand_books = [book for book in books.values() if book['checkout_count'] > 20]
-    if high_demand_books:
-        print(f"\n🚨 HIGH DEMAND ALERT: {len(high_demand_books)} books have >20 checkouts!")
+    if report['high_demand_count']:
+        print(f"\n🚨 HIGH DEMAND ALERT: {report['high_demand_count']} books have >{HIGH_DEMAND_CHECKOUTS} checkouts!")
         print("Consider adding more copies for these titles.")
 
-def transaction_summary():
+@instrumented
+@cached_report()
+def history_totals(workers):
+    """Recount transaction and per-student totals from every transaction, in up to workers processes
+    
+    Archived transactions are taken from the archive totals, as
+    rebuild_indexes does. Fines are whole days at FINE_PER_DAY, so the sums
+    come out the same however the rows are split.
+    """
+    # Only copying the columns needs the lock; the counting runs while checkouts carry on
+    with shared_lock:
+        partitions = partition_history(transactions, workers)
+        scanned = len(transactions.status_column)
+        students = {student_id: {'name': archived['name'], 'total_loans': archived['total_loans'],
+                                 'active_loans': 0, 'total_fines': archived['total_fines']}
+                    for student_id, archived in archive_state["students"].items()}
+    totals = aggregate_partitions(partitions)
+    record_scan(scanned, len(totals["students"]))
+    
+    for student_id, recounted in totals["students"].items():
+        stats = students.get(student_id)
+        if stats is None:
+            students[student_id] = recounted
+            continue
+        stats['total_loans'] += recounted['total_loans']
+        stats['active_loans'] += recounted['active_loans']
+        stats['total_fines'] += recounted['total_fines']
+    totals["students"] = students
+    return totals
+
+@instrumented
+@cached_report(dated=True)
+def transaction_summary_data(workers=None):
+    """Build the transaction summary report as a dict, recounted in worker processes if workers is given"""
+    # The recount runs outside the lock; only the in-memory figures are read under it
+    history = history_totals(workers) if workers is not None else None
+    with shared_lock:
+        if history is None:
+            in_memory, active_loans, fines = len(transactions), len(loans_by_due_date), transactions.total_fines()
+            record_scan(len(transactions.fine_column), 0)
+        else:
+            in_memory, active_loans, fines = history["transactions"], history["active_loans"], history["fines"]
+        
+        # Recent transactions (last 5)
+        recent_trans = [(trans_id, transactions[trans_id]) for trans_id in islice(reversed(transactions), 5)][::-1]
+        
+        # Archived transactions are counted from the archive totals, not read back
+        total_transactions = in_memory + archive_state["transactions"]
+        record_scan(len(recent_trans), len(recent_trans))
+        
+        return {
+            "report_date": get_current_date(),
+            "total_transactions": total_transactions,
+            "archived_transactions": archive_state["transactions"],
+            "active_loans": active_loans,
+            "completed_returns": total_transactions - active_loans,
+            "total_fines": fines + archive_state["fines"],
+            "pending_fines": calculate_pending_fines(get_current_day()),
+            "recent": [{"transaction_id": trans_id, "book_title": books[trans['book_id']]['title'],
+                        "student_name": trans['student_name'], "status": trans['status']}
+                       for trans_id, trans in recent_trans]
+        }
+
+def transaction_summary(workers=None):
     """Generate transaction summary report"""
     print("\n=== TRANSACTION SUMMARY ===")
     
-    current_date = get_current_date()
-    
-    # Active loans
-    active_loans = [t for t in transactions.values() if t['status'] == 'borrowed']
+    report = transaction_summary_data(workers)
     
-    # Completed returns
-    completed_returns = [t for t in transactions.values() if t['status'] == 'returned']
+    print(f"Report Date: {report['report_date']}")
+    print(f"Total Transactions: {report['total_transactions']}")
+    print(f"Active Loans: {report['active_loans']}")
+    print(f"Completed Returns: {report['completed_returns']}")
+    if report['archived_transactions']:
+        print(f"Archived Transactions: {report['archived_transactions']}")
+    print(f"Total Fines Collected: ${report['total_fines']:.2f}")
+    print(f"Pending Fines (Overdue): ${report['pending_fines']:.2f}")
     
-    # Calculate total fines
-    total_fines = sum(t['fine'] for t in transactions.values())
-    pending_fines = 0.0
+    if report['recent']:
+        print(f"\nRecent Transactions:")
+        print("-"*60)
+        for trans in report['recent']:
+            print(f"{trans['transaction_id']}: {trans['book_title'][:20]} - {trans['student_name']} "
+                  f"({trans['status']})")
+
+@instrumented
+def return_history_data(start_day=None, end_day=None):
+    """Count returns and fines per month between two day ordinals, streaming the archive"""
+    months: Dict[str, Dict] = {}
+    
+    def add(trans):
+        month = months.setdefault(format_day(trans['return_date'])[:7], {"returns": 0, "fines": 0.0})
+        month["returns"] += 1
+        month["fines"] += trans['fine']
+    
+    archived = 0
+    for _, trans in iter_archive(start_day, end_day):
+        add(trans)
+        archived += 1
+    with shared_lock:
+        for _, trans in transactions.records():
+            if (trans['status'] == 'returned'
+                    and (start_day is None or trans['return_date'] >= start_day)
+                    and (end_day is None or trans['return_date'] <= end_day)):
+                add(trans)
+        record_scan(archived + len(transactions), len(months))
+    
+    return {
+        "months": [dict(month=month, **months[month]) for month in sorted(months)],
+        "returns": sum(month["returns"] for month in months.values()),
+        "fines": sum(month["fines"] for month in months.values())
+    }
+
+def return_history_report():
+    """Show returns and fines per month, including archived transactions"""
+    print("\n=== RETURN HISTORY ===")
     
-    # Calculate pending fines for overdue books
-    for trans in active_loans:
-        days_overdue = calculate_days_difference(trans['due_date'], current_date)
-        if days_overdue > 0:
-            pending_fines += days_overdue * FINE_PER_DAY
+    try:
+        start_input = input("From date (YYYY-MM-DD, blank for all): ").strip()
+        end_input = input("To date (YYYY-MM-DD, blank for all): ").strip()
+        start_day = to_day(start_input) if start_input else None
+        end_day = to_day(end_input) if end_input else None
+    except ValueError:
+        print("Invalid date! Use YYYY-MM-DD.")
+        return
     
-    print(f"Report Date: {current_date}")
-    print(f"Total Transactions: {len(transactions)}")
-    print(f"Active Loans: {len(active_loans)}")
-    print(f"Completed Returns: {len(completed_returns)}")
-    print(f"Total Fines Collected: ${total_fines:.2f}")
-    print(f"Pending Fines (Overdue): ${pending_fines:.2f}")
+    report = return_history_data(start_day, end_day)
+    if not report['months']:
+        print("No returns in this period.")
+        return
     
-    # Recent transactions (last 5)
-    recent_trans = list(transactions.items())[-5:]
-    if recent_trans:
-        print(f"\nRecent Transactions:")
-        print("-"*60)
-        for trans_id, trans in recent_trans:
-            book_title = books[trans['book_id']]['title'][:20]
-            status = trans['status']
-            print(f"{trans_id}: {book_title} - {trans['student_name']} ({status})")
+    print(f"{'Month':<10} {'Returns':<10} {'Fines':<10}")
+    print("-"*32)
+    for month in report['months']:
+        print(f"{month['month']:<10} {month['returns']:<10} ${month['fines']:<9.2f}")
+    print("-"*32)
+    print(f"{'Total':<10} {report['returns']:<10} ${report['fines']:.2f}")
+
+def student_rows(cursor=None, stats_table=None):
+    """Yield (cursor, row) for students in first-seen order, resuming after a cursor
+    
+    Rows come from student_stats unless another table of the same shape is
+    given. Students are only ever added, so the cursor is a position in it.
+    """
+    stats_table = student_stats if stats_table is None else stats_table
+    for position, student_id, stats in growing_items(stats_table, cursor or 0):
+        yield position + 1, {"student_id": student_id, "name": stats['name'], "total_loans": stats['total_loans'],
+                             "active_loans": stats['active_loans'], "total_fines": stats['total_fines']}
+
+def database_student_stats():
+    """Per-student totals grouped on the database's student_id index plus the archive totals, like student_stats"""
+    stats = {student_id: {'name': archived['name'], 'total_loans': archived['total_loans'],
+                          'active_loans': 0, 'total_fines': archived['total_fines']}
+             for student_id, archived in archive_state["students"].items()}
+    for student_id, name, total_loans, active_loans, total_fines in storage["db"].student_activity():
+        student = stats.setdefault(student_id, {'name': name, 'total_loans': 0, 'active_loans': 0, 'total_fines': 0.0})
+        student['total_loans'] += total_loans
+        student['active_loans'] += active_loans
+        student['total_fines'] += total_fines
+    return stats
+
+@instrumented
+@cached_report()
+def student_activity_data(workers=None):
+    """Build the student activity report as {student_id: stats}, recounted in worker processes if workers is given"""
+    if workers is not None:
+        source = history_totals(workers)["students"]
+        record_scan(len(source), len(source))
+        return source
+    with shared_lock:
+        if storage["db"] is not None:
+            activity = database_student_stats()
+            record_scan(len(activity), len(activity))
+            return activity
+        record_scan(len(student_stats), len(student_stats))
+        return {student_id: dict(stats) for student_id, stats in student_stats.items()}
 
-def student_activity_report():
+@instrumented
+@cached_report()
+def student_stats_page(sort_by="total_loans", descending=True, page=1, page_size=20):
+    """Get one page of students ordered by a column; returns (rows, total_students)
+    
+    Each row is a stats dict with its student_id added. Only the first
+    page * page_size students are ever put in order.
+    """
+    if sort_by not in STUDENT_STATS_COLUMNS:
+        raise ValueError(f"Cannot sort by {sort_by}; choose from {', '.join(STUDENT_STATS_COLUMNS)}")
+    
+    if sort_by == "student_id":
+        key = lambda item: item[0]
+    else:
+        key = lambda item: item[1][sort_by]
+    with shared_lock:
+        source = database_student_stats() if storage["db"] is not None else student_stats
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        ordered = pick(page * page_size, source.items(), key=key)
+        
+        rows = [dict(stats, student_id=student_id) for student_id, stats in ordered[(page - 1) * page_size:]]
+        record_scan(len(source), len(rows))
+        return rows, len(source)
+
+def student_activity_report(workers=None):
     """Generate student activity report"""
     print("\n=== STUDENT ACTIVITY REPORT ===")
     
-    # Group transactions by student
-    student_stats = {}
-    
-    for trans in transactions.values():
-        student_id = trans['student_id']
-        if student_id not in student_stats:
-            student_stats[student_id] = {
-                'name': trans['student_name'],
-                'total_loans': 0,
-                'active_loans': 0,
-                'total_fines': 0.0
-            }
-        
-        student_stats[student_id]['total_loans'] += 1
-        if trans['status'] == 'borrowed':
-            student_stats[student_id]['active_loans'] += 1
-        student_stats[student_id]['total_fines'] += trans['fine']
-    
     print(f"{'Student ID':<12} {'Name':<20} {'Total Loans':<12} {'Active':<8} {'Fines':<8}")
     print("-"*65)
     
-    for student_id, stats in student_stats.items():
-        print(f"{student_id:<12} {stats['name'][:19]:<20} {stats['total_loans']:<12} "
+    def print_row(stats):
+        print(f"{stats['student_id']:<12} {stats['name'][:19]:<20} {stats['total_loans']:<12} "
               f"{stats['active_loans']:<8} ${stats['total_fines']:<7.2f}")
+    
+    if workers is None:
+        page_through(student_rows, lambda: None, print_row, STUDENT_STATS_COLUMNS)
+    else:
+        recounted = student_activity_data(workers)
+        page_through(lambda cursor: student_rows(cursor, recounted), lambda: None, print_row, STUDENT_STATS_COLUMNS)
+
+def end_of_term_report():
+    """Recount the transaction summary and student activity from the full history in parallel"""
+    workers = REPORT_WORKERS or os.cpu_count() or 1
+    print(f"\nRecounting transaction history with up to {workers} worker processes...")
+    transaction_summary(workers)
+    student_activity_report(workers)
+
+def student_ranking_report():
+    """Page through students sorted by any column"""
+    print("\n=== STUDENT RANKING ===")
+    print(f"Columns: {', '.join(STUDENT_STATS_COLUMNS)}")
+    
+    sort_by = input("Sort by [total_fines]: ").strip().lower() or "total_fines"
+    if sort_by not in STUDENT_STATS_COLUMNS:
+        print("Invalid column!")
+        return
+    descending = input("Highest first? (y/n) [y]: ").strip().lower() != "n"
+    
+    page = 1
+    while True:
+        rows, total_students = student_stats_page(sort_by, descending, page, 20)
+        if not rows:
+            print("No more students.")
+            return
+        
+        print(f"\n{'Student ID':<12} {'Name':<20} {'Total Loans':<12} {'Active':<8} {'Fines':<8}")
+        print("-"*65)
+        for stats in rows:
+            print(f"{stats['student_id']:<12} {stats['name'][:19]:<20} {stats['total_loans']:<12} "
+                  f"{stats['active_loans']:<8} ${stats['total_fines']:<7.2f}")
+        print(f"Page {page} of {(total_students + 19) // 20}")
+        
+        if page * 20 >= total_students or input("Enter for next page, q to stop: ").strip().lower() == "q":
+            return
+        page += 1
+
+@instrumented
+@cached_report(dated=True)
+def fine_assessment_data():
+    """Build the nightly fine assessment as a dict"""
+    assessment = assess_fines(get_current_day())
+    bands = []
+    for band, (first_day, loans, fines) in enumerate(assessment['bands']):
+        last_day = FINE_BANDS[band + 1] - 1 if band + 1 < len(FINE_BANDS) else None
+        label = f"{first_day}-{last_day} days" if last_day else f"{first_day}+ days"
+        bands.append({"days_overdue": label, "loans": loans, "fines": fines})
+    
+    return {
+        "report_date": get_current_date(),
+        "engine": "numpy" if np is not None else "python",
+        "overdue_loans": assessment['overdue_loans'],
+        "pending_fines": assessment['pending_fines'],
+        "max_days_overdue": assessment['max_days_overdue'],
+        "bands": bands
+    }
+
+def fine_assessment_report():
+    """Show pending fines grouped by how long loans have been overdue"""
+    print("\n=== FINE ASSESSMENT ===")
+    
+    report = fine_assessment_data()
+    
+    print(f"Report Date: {report['report_date']}")
+    print(f"Overdue Loans: {report['overdue_loans']}")
+    print(f"Pending Fines: ${report['pending_fines']:.2f}")
+    print(f"Longest Overdue: {report['max_days_overdue']} days")
+    
+    if report['overdue_loans']:
+        print(f"\n{'Days Overdue':<14} {'Loans':<8} {'Fines':<12}")
+        print("-"*60)
+        for band in report['bands']:
+            bar = "#" * round(30 * band['loans'] / report['overdue_loans'])
+            print(f"{band['days_overdue']:<14} {band['loans']:<8} ${band['fines']:<11.2f} {bar}")
 
 # =============================================================================
 # MAIN MENU SYSTEM
@@ -535,6 +2694,7 @@ def inventory_menu():
         print("2. Update Book Information")
         print("3. Display All Books")
         print("4. Search Books")
+        print("5. Bulk Import Books")
         print("0. Back to Main Menu")
         
         try:
@@ -551,6 +2711,8 @@ def inventory_menu():
             display_all_books()
         elif choice == 4:
             search_books()
+        elif choice == 5:
+            bulk_import_books()
         elif choice == 0:
             break
         else:
@@ -565,6 +2727,11 @@ def transaction_menu():
         print("1. Checkout Book")
         print("2. Return Book")
         print("3. View Overdue Books")
+        print("4. View Student Loans")
+        print("5. Batch Checkout/Return")
+        print("6. Archive Old Returns")
+        print("7. Place Hold")
+        print("8. View Hold Queue")
         print("0. Back to Main Menu")
         
         try:
@@ -579,6 +2746,16 @@ def transaction_menu():
             return_book()
         elif choice == 3:
             view_overdue_books()
+        elif choice == 4:
+            view_student_loans()
+        elif choice == 5:
+            batch_desk_session()
+        elif choice == 6:
+            archive_old_returns()
+        elif choice == 7:
+            place_hold()
+        elif choice == 8:
+            view_hold_queue()
         elif choice == 0:
             break
         else:
@@ -594,12 +2771,17 @@ def reports_menu():
         print("2. Popular Books Report")
         print("3. Transaction Summary")
         print("4. Student Activity Report")
+        print("5. Popular Books by Genre")
+        print("6. Student Ranking")
+        print("7. Fine Assessment")
+        print("8. Return History")
+        print("9. End-of-Term Report")
         print("0. Back to Main Menu")
         
         choice_input = input("\nSelect option: ").strip()
         
         if not choice_input.isdigit() or len(choice_input) != 1:
-            print("Please enter a valid single digit (0-4)!")
+            print("Please enter a valid single digit (0-9)!")
             input("Press Enter to continue...")
             continue
         
@@ -613,10 +2795,20 @@ def reports_menu():
             transaction_summary()
         elif choice == 4:
             student_activity_report()
+        elif choice == 5:
+            popular_books_report(input("Enter genre: ").strip())
+        elif choice == 6:
+            student_ranking_report()
+        elif choice == 7:
+            fine_assessment_report()
+        elif choice == 8:
+            return_history_report()
+        elif choice == 9:
+            end_of_term_report()
         elif choice == 0:
             break
         else:
-            print("Invalid option! Please enter a number between 0-4.")
+            print("Invalid option! Please enter a number between 0-9.")
             input("Press Enter to continue...")
 
 def main_menu():
@@ -636,6 +2828,7 @@ def main_menu():
         print("2. Transaction Processing")
         print("3. Reports & Analytics")
         print("4. System Status")
+        print("5. Performance")
         print("0. Exit System")
         
         try:
@@ -652,6 +2845,8 @@ def main_menu():
             reports_menu()
         elif choice == 4:
             display_system_status()
+        elif choice == 5:
+            display_performance()
         elif choice == 0:
             print("\nThank you for using Campus Library Manager!")
             print("System shutting down...")
@@ -659,29 +2854,35 @@ def main_menu():
         else:
             print("Invalid option! Please try again.")
 
+@instrumented
+@cached_report(dated=True)
+def system_status_data():
+    """Build the system status figures as a dict"""
+    with shared_lock:
+        return {
+            "total_titles": inventory_totals["total_titles"],
+            "total_copies": inventory_totals["total_copies"],
+            "available_copies": inventory_totals["available_copies"],
+            "active_loans": len(loans_by_due_date),
+            "overdue_count": count_overdue_loans(get_current_day()),
+            "loan_period_days": LOAN_PERIOD_DAYS,
+            "fine_per_day": FINE_PER_DAY,
+            "max_books_per_student": MAX_BOOKS_PER_STUDENT
+        }
+
 def display_system_status():
     """Display quick system status"""
     print("\n" + "="*60)
     print("                    SYSTEM STATUS")
     print("="*60)
     
-    total_books = len(books)
-    total_copies = sum(book['total_copies'] for book in books.values())
-    available_copies = sum(book['available_copies'] for book in books.values())
-    active_loans = len([t for t in transactions.values() if t['status'] == 'borrowed'])
-    
-    # Calculate overdue books
-    current_date = get_current_date()
-    overdue_count = 0
-    for trans in transactions.values():
-        if trans['status'] == 'borrowed':
-            if calculate_days_difference(trans['due_date'], current_date) > 0:
-                overdue_count += 1
-    
-    print(f"📚 Total Book Titles: {total_books}")
-    print(f"📖 Total Copies: {total_copies}")
-    print(f"✅ Available Copies: {available_copies}")
-    print(f"📋 Active Loans: {active_loans}")
+    status = system_status_data()
+    overdue_count = status['overdue_count']
+    
+    print(f"📚 Total Book Titles: {status['total_titles']}")
+    print(f"📖 Total Copies: {status['total_copies']}")
+    print(f"✅ Available Copies: {status['available_copies']}")
+    print(f"📋 Active Loans: {status['active_loans']}")
     print(f"⚠️  Overdue Books: {overdue_count}")
     print(f"💰 System Configuration:")
     print(f"   - Loan Period: {LOAN_PERIOD_DAYS} days")
@@ -691,15 +2892,187 @@ def display_system_status():
     if overdue_count > 0:
         print(f"\n🚨 ACTION REQUIRED: {overdue_count} books are overdue!")
 
+def performance_data():
+    """Build per-operation metrics as a list of dicts, slowest in total first"""
+    with metrics_lock:
+        snapshot = {name: dict(metrics, buckets=list(metrics["buckets"])) for name, metrics in performance.items()}
+    
+    rows = []
+    for name, metrics in snapshot.items():
+        p95 = latency_percentile(metrics["buckets"], 0.95)
+        rows.append({
+            "operation": name,
+            "calls": metrics["calls"],
+            "errors": metrics["errors"],
+            "total_ms": metrics["seconds"] * 1000,
+            "average_ms": metrics["seconds"] * 1000 / metrics["calls"],
+            "max_ms": metrics["max_seconds"] * 1000,
+            "p95_ms_at_most": p95 * 1000 if p95 is not None else None,
+            "scanned": metrics["scanned"],
+            "returned": metrics["returned"]
+        })
+    rows.sort(key=lambda row: -row["total_ms"])
+    return rows
+
+def display_performance():
+    """Display call counts, latency and scan efficiency per operation"""
+    print("\n" + "="*100)
+    print("                                      PERFORMANCE")
+    print("="*100)
+    
+    rows = performance_data()
+    if not rows:
+        print("No operations recorded yet.")
+        return
+    
+    print(f"{'Operation':<30} {'Calls':<8} {'Errors':<7} {'Avg ms':<10} {'p95 ms':<10} {'Max ms':<10} "
+          f"{'Scanned':<12} {'Returned':<10}")
+    print("-"*100)
+    for row in rows:
+        if row['p95_ms_at_most'] is not None:
+            p95 = f"<={row['p95_ms_at_most']:g}"
+        else:
+            p95 = f">{LATENCY_BUCKETS[-1] * 1000:g}"
+        print(f"{row['operation'][:29]:<30} {row['calls']:<8} {row['errors']:<7} {row['average_ms']:<10.3f} "
+              f"{p95:<10} {row['max_ms']:<10.3f} {row['scanned']:<12} {row['returned']:<10}")
+    print("-"*100)
+    print(f"Report cache: {report_cache['hits']} hits, {report_cache['misses']} misses")
+    
+    if storage["log"] is not None or storage["db"] is not None:
+        if write_metrics_file():
+            print(f"Metrics file: {METRICS_FILE}")
+
+# =============================================================================
+# PROFILING
+# =============================================================================
+
+# Menu actions timed under cProfile when profiling is on (--profile or LIBRARY_PROFILE=1)
+PROFILED_ACTIONS = ("add_book", "update_book", "display_all_books", "search_books", "bulk_import_books",
+                    "checkout_book", "return_book", "view_overdue_books", "view_student_loans",
+                    "batch_desk_session", "archive_old_returns", "place_hold", "view_hold_queue",
+                    "inventory_report", "popular_books_report", "transaction_summary", "student_activity_report",
+                    "student_ranking_report", "fine_assessment_report", "return_history_report",
+                    "end_of_term_report", "display_system_status", "display_performance")
+
+# Profiling session: action name -> {calls, seconds, max_seconds, stats}, plus every call with data sizes
+profile_session = {"started": None, "actions": {}, "calls": []}
+profiling_state = threading.local()
+
+def profiled(function):
+    """Wrap a menu action so each call runs under cProfile and is added to the session"""
+    name = function.__name__
+    
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        # cProfile cannot nest; an action called from another is part of the outer profile
+        if getattr(profiling_state, "active", False):
+            return function(*args, **kwargs)
+        
+        sizes = {"books": len(books), "transactions": len(transactions),
+                 "active_loans": len(loans_by_due_date), "students": len(student_stats)}
+        profiler = cProfile.Profile()
+        profiling_state.active = True
+        start = time.perf_counter()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            profiling_state.active = False
+            record_profile(name, seconds, sizes, profiler)
+    return wrapper
+
+def record_profile(name, seconds, sizes, profiler):
+    """Add one profiled call to the session"""
+    action = profile_session["actions"].get(name)
+    if action is None:
+        action = profile_session["actions"][name] = {
+            "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "stats": pstats.Stats(profiler)
+        }
+    else:
+        action["stats"].add(profiler)
+    action["calls"] += 1
+    action["seconds"] += seconds
+    action["max_seconds"] = max(action["max_seconds"], seconds)
+    profile_session["calls"].append(dict(sizes, action=name, seconds=seconds,
+                                         at=datetime.now().strftime("%H:%M:%S")))
+
+def enable_profiling():
+    """Swap the menu actions for profiled versions (the menus look them up at call time)"""
+    profile_session.update(started=datetime.now(), actions={}, calls=[])
+    for name in PROFILED_ACTIONS:
+        globals()[name] = profiled(globals()[name])
+
+def write_profile_report():
+    """Write the session's timings, data sizes and hottest functions; returns the report path or None"""
+    if not profile_session["calls"]:
+        return None
+    
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = profile_session["started"].strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(PROFILE_DIR, f"session-{stamp}.txt")
+    actions = sorted(profile_session["actions"].items(), key=lambda item: -item[1]["seconds"])
+    
+    with open(path, "w") as f:
+        f.write(f"Campus Library Manager profile - session started {profile_session['started']:%Y-%m-%d %H:%M:%S}\n\n")
+        f.write(f"{'Action':<26} {'Calls':<7} {'Total s':<10} {'Mean s':<10} {'Max s':<10}\n")
+        f.write("-"*66 + "\n")
+        for name, action in actions:
+            f.write(f"{name:<26} {action['calls']:<7} {action['seconds']:<10.4f} "
+                    f"{action['seconds'] / action['calls']:<10.4f} {action['max_seconds']:<10.4f}\n")
+        
+        f.write(f"\nCalls in order\n{'At':<10} {'Action':<26} {'Seconds':<10} {'Books':<10} "
+                f"{'Transactions':<14} {'Active loans':<13} {'Students':<10}\n")
+        f.write("-"*97 + "\n")
+        for call in profile_session["calls"]:
+            f.write(f"{call['at']:<10} {call['action']:<26} {call['seconds']:<10.4f} {call['books']:<10} "
+                    f"{call['transactions']:<14} {call['active_loans']:<13} {call['students']:<10}\n")
+        
+        for name, action in actions:
+            f.write(f"\n{'=' * 80}\nHottest functions in {name} (by cumulative time)\n{'=' * 80}\n")
+            action["stats"].stream = f
+            action["stats"].sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            # Full data for tools such as snakeviz or pstats
+            action["stats"].dump_stats(os.path.join(PROFILE_DIR, f"session-{stamp}-{name}.prof"))
+    return path
+
 # =============================================================================
 # MAIN PROGRAM EXECUTION
 # =============================================================================
 
 if __name__ == "__main__":
+    if "--archive" in sys.argv:
+        # Nightly job: move old returns out of memory and exit; refused while the desk has the data open
+        try:
+            open_storage()
+        except RuntimeError as e:
+            print(e)
+            sys.exit(1)
+        print(f"Archived {archive_transactions()} returned transactions.")
+        close_storage()
+        sys.exit(0)
+    
+    # Helper modules import library_manager_system; point them at this module's state
+    sys.modules.setdefault("library_manager_system", sys.modules[__name__])
+    
+    profiling = "--profile" in sys.argv or os.environ.get("LIBRARY_PROFILE") == "1"
+    if profiling:
+        enable_profiling()
+    
     try:
+        open_storage()
+        if "--serve" in sys.argv:
+            from library_service import SERVICE_HOST, SERVICE_PORT, start_service_thread
+            start_service_thread()
+            print(f"JSON service running on http://{SERVICE_HOST}:{SERVICE_PORT}")
         main_menu()
     except KeyboardInterrupt:
         print("\n\nSystem interrupted by user. Goodbye!")
     except Exception as e:
         print(f"\nAn error occurred: {e}")
-        print("Please contact system administrator.")
\ No newline at end of file
+        print("Please contact system administrator.")
+    finally:
+        close_storage()
+        if profiling:
+            report_path = write_profile_report()
+            if report_path:
+                print(f"Profile report written to {report_path}")
\ No newline at end of file
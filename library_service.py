@@ -0,0 +1,307 @@
+# Campus Library Manager - Headless JSON service
+#
+# Serves the inventory, loan and report functions of library_manager_system
+# over HTTP from one asyncio event loop. Requests work on the same in-memory
+# books/transactions as the menus, so the service can run next to the
+# interactive CLI (start_service_thread) or on its own (python library_service.py).
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import library_manager_system as library
+
+SERVICE_HOST = os.environ.get("LIBRARY_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("LIBRARY_SERVICE_PORT", "8080"))
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """An error that should be sent back to the client with a status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# =============================================================================
+# ENDPOINTS
+# =============================================================================
+
+def book_result(book_id):
+    """A book record with its ID, for JSON responses"""
+    return dict(library.books[book_id], book_id=book_id)
+
+def search_books(query, body):
+    """GET /books?title=&author=&genre=&words=1&limit=N"""
+    limit = int(query.get("limit", 0) or 0) or None
+    with library.shared_lock:
+        ranked = library.find_books(query.get("title"), query.get("author"), query.get("genre"),
+                                    match_words=query.get("words") == "1", limit=limit)
+        return 200, {"books": [dict(book_result(book_id), score=score) for book_id, score in ranked]}
+
+def get_book(query, body, book_id):
+    """GET /books/<id>"""
+    book_id = book_id.upper()
+    if not library.book_exists(book_id):
+        raise RequestError(404, f"Book with ID {book_id} not found!")
+    return 200, book_result(book_id)
+
+def add_book(query, body):
+    """POST /books"""
+    success, error = library.process_add_book(body.get("book_id", ""), body.get("title", ""),
+                                              body.get("author", ""), body.get("genre", ""),
+                                              body.get("total_copies", ""), body.get("publication_year", ""))
+    if not success:
+        raise RequestError(409 if "already exists" in error else 400, error)
+    return 201, book_result(str(body["book_id"]).strip().upper())
+
+def update_book(query, body, book_id):
+    """PUT /books/<id> with any of title, author, genre, total_copies, publication_year"""
+    book_id = book_id.upper()
+    success, error = library.process_book_update(book_id, body.get("title", ""), body.get("author", ""),
+                                                 body.get("genre", ""), body.get("total_copies", ""),
+                                                 body.get("publication_year", ""))
+    if not success:
+        raise RequestError(404 if "not found" in error else 400, error)
+    return 200, book_result(book_id)
+
+def checkout(query, body):
+    """POST /checkout {student_id, student_name, book_id}"""
+    success, result = library.process_checkout(str(body.get("student_id", "")).strip().upper(),
+                                               str(body.get("student_name", "")).strip(),
+                                               str(body.get("book_id", "")).strip().upper())
+    if not success:
+        raise RequestError(400, result)
+    transaction = library.transactions[result]
+    return 201, {"transaction_id": result, "due_date": library.format_day(transaction['due_date'])}
+
+def return_book(query, body):
+    """POST /return {transaction_id}"""
+    transaction_id = str(body.get("transaction_id", "")).strip().upper()
+    success, result = library.process_return(transaction_id)
+    if not success:
+        raise RequestError(404 if "not found" in result else 400, result)
+    return 200, {"transaction_id": transaction_id, "fine": result}
+
+def place_hold(query, body):
+    """POST /holds {student_id, student_name, book_id}"""
+    book_id = str(body.get("book_id", "")).strip().upper()
+    success, result = library.process_place_hold(str(body.get("student_id", "")).strip().upper(),
+                                                 str(body.get("student_name", "")).strip(), book_id)
+    if not success:
+        raise RequestError(404 if "not found" in result else 409 if "already" in result else 400, result)
+    return 201, {"book_id": book_id, "position": result}
+
+def book_holds(query, body, book_id):
+    """GET /books/<id>/holds"""
+    book_id = book_id.upper()
+    if not library.book_exists(book_id):
+        raise RequestError(404, f"Book with ID {book_id} not found!")
+    return 200, library.hold_queue_data(book_id)
+
+def batch(query, body):
+    """POST /batch {operations: [...], atomic: bool}"""
+    operations = body.get("operations", [])
+    if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+        raise RequestError(400, "operations must be a list of JSON objects")
+    results = library.process_batch(operations, bool(body.get("atomic")))
+    return 200, {"results": results}
+
+def student_loans(query, body, student_id):
+    """GET /students/<id>/loans"""
+    with library.shared_lock:
+        loans = [dict(transaction_id=tid, book_id=trans['book_id'],
+                      checkout_date=library.format_day(trans['checkout_date']),
+                      due_date=library.format_day(trans['due_date']))
+                 for tid, trans in library.get_student_open_transactions(student_id.upper())]
+    return 200, {"student_id": student_id.upper(), "loans": loans}
+
+def read_only(builder):
+    """Wrap a report builder that takes no parameters (it holds shared_lock itself while reading)"""
+    def endpoint(query, body):
+        return 200, builder()
+    endpoint.__doc__ = builder.__doc__
+    return endpoint
+
+def popular_books(query, body):
+    """GET /reports/popular?limit=N&genre=G"""
+    return 200, library.popular_books_data(int(query.get("limit", 10)), query.get("genre") or None)
+
+def student_activity(query, body):
+    """GET /reports/students?sort=total_fines&order=desc&page=1&page_size=50"""
+    page = max(1, int(query.get("page", 1)))
+    page_size = max(1, int(query.get("page_size", 50)))
+    rows, total_students = library.student_stats_page(query.get("sort", "total_loans"),
+                                                      query.get("order", "desc") != "asc", page, page_size)
+    return 200, {"students": rows, "page": page, "page_size": page_size, "total_students": total_students}
+
+def page_size_of(query):
+    """Read the page_size query parameter of a cursor-paged report"""
+    return max(1, int(query.get("page_size", library.REPORT_PAGE_SIZE)))
+
+def overdue_books(query, body):
+    """GET /overdue?cursor=C&page_size=N; pass back next_cursor for the following page"""
+    return 200, library.overdue_books_data(query.get("cursor") or None, page_size_of(query))
+
+def inventory_report(query, body):
+    """GET /reports/inventory?cursor=C&page_size=N; the cursor pages the unavailable books"""
+    cursor = int(query["cursor"]) if query.get("cursor") else None
+    return 200, library.inventory_report_data(cursor, page_size_of(query))
+
+def performance(query, body):
+    """GET /performance"""
+    return 200, {"operations": library.performance_data()}
+
+ROUTES = {
+    ("GET", "/books"): search_books,
+    ("POST", "/books"): add_book,
+    ("POST", "/checkout"): checkout,
+    ("POST", "/return"): return_book,
+    ("POST", "/batch"): batch,
+    ("POST", "/holds"): place_hold,
+    ("GET", "/overdue"): overdue_books,
+    ("GET", "/status"): read_only(library.system_status_data),
+    ("GET", "/reports/inventory"): inventory_report,
+    ("GET", "/reports/popular"): popular_books,
+    ("GET", "/reports/transactions"): read_only(library.transaction_summary_data),
+    ("GET", "/reports/students"): student_activity,
+    ("GET", "/reports/fines"): read_only(library.fine_assessment_data),
+    ("GET", "/performance"): performance,
+}
+
+# Routes with one path parameter: (method, prefix, suffix) -> handler
+PARAMETER_ROUTES = {
+    ("GET", "/books/", ""): get_book,
+    ("PUT", "/books/", ""): update_book,
+    ("GET", "/books/", "/holds"): book_holds,
+    ("GET", "/students/", "/loans"): student_loans,
+}
+
+
+def route(method, path):
+    """Find the handler and path arguments for a request"""
+    handler = ROUTES.get((method, path))
+    if handler is not None:
+        return handler, ()
+
+    path_known = any(known_path == path for _, known_path in ROUTES)
+    for (route_method, prefix, suffix), handler in PARAMETER_ROUTES.items():
+        if path.startswith(prefix) and path.endswith(suffix) and len(path) > len(prefix) + len(suffix):
+            parameter = path[len(prefix):len(path) - len(suffix)]
+            if "/" in parameter:
+                continue
+            path_known = True
+            if route_method == method:
+                return handler, (parameter,)
+
+    if path_known:
+        raise RequestError(405, f"{method} is not supported for {path}")
+    raise RequestError(404, f"No endpoint at {path}")
+
+def handle_request(method, target, body_bytes) -> Tuple[int, Dict]:
+    """Run one request and return (status, JSON-ready body)"""
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    try:
+        body = json.loads(body_bytes) if body_bytes else {}
+        if not isinstance(body, dict):
+            raise RequestError(400, "Request body must be a JSON object")
+        handler, arguments = route(method, url.path.rstrip("/") or "/")
+        return handler(query, body, *arguments)
+    except RequestError as e:
+        return e.status, {"error": e.message}
+    except (json.JSONDecodeError, ValueError) as e:
+        return 400, {"error": str(e)}
+
+
+# =============================================================================
+# HTTP SERVER
+# =============================================================================
+
+async def handle_connection(reader, writer):
+    """Serve HTTP/1.1 requests on one connection until the client closes it"""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                await send_response(writer, 400, {"error": "Malformed request line"}, False)
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            length = int(headers.get("content-length", "0") or 0)
+            if length > MAX_BODY_BYTES:
+                await send_response(writer, 413, {"error": "Request body too large"}, False)
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            # Handlers wait on locks and fsync the log, so they run off the event loop
+            try:
+                status, payload = await asyncio.to_thread(handle_request, method.upper(), target, body)
+            except Exception as e:
+                status, payload = 500, {"error": str(e)}
+
+            keep_alive = (headers.get("connection", "").lower() != "close"
+                          and version.upper() == "HTTP/1.1")
+            await send_response(writer, status, payload, keep_alive)
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def send_response(writer, status, payload, keep_alive):
+    """Write a JSON response"""
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+async def serve(host=SERVICE_HOST, port=SERVICE_PORT, ready=None):
+    """Run the service until cancelled"""
+    server = await asyncio.start_server(handle_connection, host, port)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+def start_service_thread(host=SERVICE_HOST, port=SERVICE_PORT):
+    """Run the service in a background thread next to the interactive menus"""
+    ready = threading.Event()
+    thread = threading.Thread(target=lambda: asyncio.run(serve(host, port, ready)), daemon=True)
+    thread.start()
+    ready.wait(5)
+    return thread
+
+
+if __name__ == "__main__":
+    library.open_storage()
+    print(f"Campus Library Manager service listening on http://{SERVICE_HOST}:{SERVICE_PORT}")
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("\nService stopped.")
+    finally:
+        library.close_storage()
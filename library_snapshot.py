@@ -0,0 +1,132 @@
+# Campus Library Manager - Binary snapshot format
+#
+# A snapshot file is an 8-byte magic, a uint32 header length, a JSON header
+# (which also holds the hold records, few enough to keep as JSON) and then
+# 8-byte aligned binary sections listed in the header:
+#   <table>.offsets / <table>.data  string tables: int64 start offsets and UTF-8 bytes
+#   books                           one fixed-width record of eight int32 per book: book ID,
+#                                   title, author and genre as codes into book_strings, then
+#                                   total_copies, available_copies, checkout_count, publication_year
+#   <column>                        the TransactionStore columns, byte for byte
+#
+# Loading maps the file and copies each transaction column in one block, so
+# transactions are never turned into per-record dicts; only the string tables
+# and the book records are decoded.
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from library_store import ROW_COLUMNS, STRING_TABLES, StringTable
+
+SNAPSHOT_MAGIC = b"LIBSNAP1"
+BOOK_RECORD = struct.Struct("<8i")
+HEADER_LENGTH = struct.Struct("<I")
+
+
+class SnapshotError(Exception):
+    """A snapshot file that cannot be read"""
+
+
+def string_sections(name, values):
+    """Encode a list of strings as offsets and data sections"""
+    data = bytearray()
+    offsets = array("q", [0])
+    for value in values:
+        data += value.encode("utf-8")
+        offsets.append(len(data))
+    return [(name + ".offsets", offsets), (name + ".data", data)]
+
+def write_snapshot_file(f, sequence, books, transactions, holds):
+    """Write books, a TransactionStore and the hold records to an open binary file"""
+    strings = StringTable()
+    records = bytearray()
+    for book_id, book in books.items():
+        records += BOOK_RECORD.pack(strings.code(book_id), strings.code(book['title']),
+                                    strings.code(book['author']), strings.code(book['genre']),
+                                    book['total_copies'], book['available_copies'],
+                                    book['checkout_count'], book['publication_year'])
+
+    store = transactions.compacted()
+    sections = string_sections("book_strings", strings.values) + [("books", records)]
+    for name in STRING_TABLES:
+        sections += string_sections(name, getattr(store, name).values)
+    for name in ROW_COLUMNS + ("row_by_number",):
+        sections.append((name, getattr(store, name)))
+
+    # Offsets depend on the header length, so size the header with placeholder offsets first
+    header = {"sequence": sequence, "byteorder": sys.byteorder, "holds": holds,
+              "other_ids": {str(row): transaction_id for row, transaction_id in store.other_ids.items()},
+              "sections": {name: [0, 0, getattr(data, "typecode", "B")] for name, data in sections}}
+    header_bytes = b""
+    while True:
+        position = len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size + len(header_bytes)
+        for name, data in sections:
+            position += -position % 8
+            length = len(data) * getattr(data, "itemsize", 1)
+            header["sections"][name][:2] = [position, length]
+            position += length
+        sized = json.dumps(header).encode("utf-8")
+        sized += b" " * (-len(sized) % 8)
+        if len(sized) == len(header_bytes):
+            header_bytes = sized
+            break
+        header_bytes = sized
+
+    f.write(SNAPSHOT_MAGIC + HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+    position = len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size + len(header_bytes)
+    for name, data in sections:
+        offset, length, _ = header["sections"][name]
+        f.write(b"\0" * (offset - position))
+        f.write(data)
+        position = offset + length
+
+def read_snapshot_file(path, books, transactions, holds):
+    """Replace books, a TransactionStore and the hold records with a snapshot's contents; returns its sequence"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a library snapshot")
+        header_start = len(SNAPSHOT_MAGIC) + HEADER_LENGTH.size
+        (header_length,) = HEADER_LENGTH.unpack_from(mapped, len(SNAPSHOT_MAGIC))
+        header = json.loads(mapped[header_start:header_start + header_length])
+        swap = header["byteorder"] != sys.byteorder
+
+        with memoryview(mapped) as view:
+            def section(name):
+                offset, length, typecode = header["sections"][name]
+                column = array(typecode)
+                column.frombytes(view[offset:offset + length])
+                if swap:
+                    column.byteswap()
+                return column
+
+            def strings(name):
+                offsets = section(name + ".offsets")
+                offset, length, _ = header["sections"][name + ".data"]
+                data = view[offset:offset + length].tobytes()
+                return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+            book_strings = strings("book_strings")
+            offset, length, _ = header["sections"]["books"]
+            books.clear()
+            for (book_id, title, author, genre, total, available, checkouts, year) in \
+                    BOOK_RECORD.iter_unpack(view[offset:offset + length]):
+                books[book_strings[book_id]] = {
+                    "title": book_strings[title],
+                    "author": book_strings[author],
+                    "genre": book_strings[genre],
+                    "total_copies": total,
+                    "available_copies": available,
+                    "checkout_count": checkouts,
+                    "publication_year": year
+                }
+
+            columns = {name: section(name) for name in ROW_COLUMNS + ("row_by_number",)}
+            tables = {name: strings(name) for name in STRING_TABLES}
+
+        other_ids = {int(row): transaction_id for row, transaction_id in header["other_ids"].items()}
+        transactions.load_columns(columns, tables, other_ids)
+        holds.clear()
+        holds.update(header.get("holds", {}))  # Snapshots from before holds have none
+        return header["sequence"]
@@ -0,0 +1,236 @@
+# Campus Library Manager - SQLite storage backend
+import sqlite3
+import sys
+from typing import Dict, List, Tuple
+
+BOOK_FIELDS = ("title", "author", "genre", "total_copies", "available_copies",
+               "checkout_count", "publication_year")
+TRANSACTION_FIELDS = ("book_id", "student_id", "student_name", "checkout_date",
+                      "due_date", "return_date", "fine", "status")
+HOLD_FIELDS = ("book_id", "student_id", "student_name", "queued", "placed", "expires", "status")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    book_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    author TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    total_copies INTEGER NOT NULL,
+    available_copies INTEGER NOT NULL,
+    checkout_count INTEGER NOT NULL,
+    publication_year INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    book_id TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    student_name TEXT NOT NULL,
+    checkout_date INTEGER NOT NULL,
+    due_date INTEGER NOT NULL,
+    return_date INTEGER,
+    fine REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS holds (
+    hold_key TEXT PRIMARY KEY,
+    book_id TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    student_name TEXT NOT NULL,
+    queued INTEGER NOT NULL,
+    placed INTEGER NOT NULL,
+    expires INTEGER NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_books_author ON books (author);
+CREATE INDEX IF NOT EXISTS idx_books_genre ON books (genre COLLATE NOCASE, checkout_count);
+CREATE INDEX IF NOT EXISTS idx_books_checkout_count ON books (checkout_count);
+CREATE INDEX IF NOT EXISTS idx_transactions_student ON transactions (student_id, status);
+CREATE INDEX IF NOT EXISTS idx_transactions_book ON transactions (book_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_status_due ON transactions (status, due_date);
+"""
+
+def upsert_statement(table, key, fields):
+    """Build an INSERT that updates the existing row in place (keeping its rowid order)"""
+    return (f"INSERT INTO {table} ({key}, {', '.join(fields)}) "
+            f"VALUES ({', '.join('?' * (len(fields) + 1))}) "
+            f"ON CONFLICT ({key}) DO UPDATE SET {', '.join(f'{field} = excluded.{field}' for field in fields)}")
+
+# Statements are kept as constants so sqlite3's statement cache reuses the compiled form
+UPSERT_BOOK = upsert_statement("books", "book_id", BOOK_FIELDS)
+UPSERT_TRANSACTION = upsert_statement("transactions", "transaction_id", TRANSACTION_FIELDS)
+UPSERT_HOLD = upsert_statement("holds", "hold_key", HOLD_FIELDS)
+SELECT_BOOKS = f"SELECT book_id, {', '.join(BOOK_FIELDS)} FROM books"
+SELECT_TRANSACTIONS = f"SELECT transaction_id, {', '.join(TRANSACTION_FIELDS)} FROM transactions"
+SELECT_HOLDS = f"SELECT hold_key, {', '.join(HOLD_FIELDS)} FROM holds ORDER BY queued"
+SELECT_STUDENT_LOANS = SELECT_TRANSACTIONS + " WHERE student_id = ? AND status = 'borrowed' ORDER BY rowid"
+SELECT_OVERDUE = ("SELECT t.transaction_id, t.due_date, t.student_id, t.student_name, b.title "
+                  "FROM transactions t JOIN books b ON b.book_id = t.book_id "
+                  "WHERE t.status = 'borrowed' AND t.due_date < ? AND (t.due_date, t.transaction_id) > (?, ?) "
+                  "ORDER BY t.due_date, t.transaction_id LIMIT ?")
+COUNT_OVERDUE = ("SELECT COUNT(*), COALESCE(SUM(? - due_date), 0) FROM transactions "
+                 "WHERE status = 'borrowed' AND due_date < ?")
+SELECT_POPULAR = "SELECT book_id, title, checkout_count, genre FROM books ORDER BY checkout_count DESC, rowid LIMIT ?"
+SELECT_POPULAR_IN_GENRE = ("SELECT book_id, title, checkout_count, genre FROM books WHERE genre = ? COLLATE NOCASE "
+                           "ORDER BY checkout_count DESC, rowid LIMIT ?")
+COUNT_ABOVE_CHECKOUTS = "SELECT COUNT(*) FROM books WHERE checkout_count > ?"
+COUNT_ABOVE_CHECKOUTS_IN_GENRE = "SELECT COUNT(*) FROM books WHERE genre = ? COLLATE NOCASE AND checkout_count > ?"
+# A bare column next to MIN(rowid) comes from the row holding the minimum, i.e. the first name seen
+SELECT_STUDENT_ACTIVITY = ("SELECT student_id, student_name, MIN(rowid), COUNT(*), SUM(status = 'borrowed'), SUM(fine) "
+                           "FROM transactions GROUP BY student_id ORDER BY MIN(rowid)")
+
+
+class SQLiteStorage:
+    """Books, transactions and holds kept in an indexed SQLite file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    # -------------------------------------------------------------------------
+    # Storage interface used by library_manager_system
+    # -------------------------------------------------------------------------
+
+    def is_empty(self):
+        """Check whether the database holds no books yet"""
+        return self.connection.execute("SELECT 1 FROM books LIMIT 1").fetchone() is None
+
+    def load_into(self, books: Dict[str, Dict], transactions: Dict[str, Dict], holds: Dict[str, Dict]):
+        """Replace the contents of the given dicts with everything in the database"""
+        books.clear()
+        for row in self.connection.execute(SELECT_BOOKS):
+            books[row[0]] = dict(zip(BOOK_FIELDS, row[1:]))
+        transactions.clear()
+        for row in self.connection.execute(SELECT_TRANSACTIONS + " ORDER BY rowid"):
+            transactions[row[0]] = dict(zip(TRANSACTION_FIELDS, row[1:]))
+        holds.clear()
+        for row in self.connection.execute(SELECT_HOLDS):
+            holds[row[0]] = dict(zip(HOLD_FIELDS, row[1:]))
+
+    def save(self, changes: List[Tuple[str, str, Dict]]):
+        """Write (kind, key, record) changes inside the current transaction (a None record deletes)"""
+        book_rows = []
+        transaction_rows = []
+        deleted_transactions = []
+        hold_rows = []
+        deleted_holds = []
+        for kind, key, record in changes:
+            if kind == "book":
+                book_rows.append((key,) + tuple(record[field] for field in BOOK_FIELDS))
+            elif kind == "hold":
+                if record is None:
+                    deleted_holds.append((key,))
+                else:
+                    hold_rows.append((key,) + tuple(record[field] for field in HOLD_FIELDS))
+            elif record is None:
+                deleted_transactions.append((key,))
+            else:
+                transaction_rows.append((key,) + tuple(record[field] for field in TRANSACTION_FIELDS))
+        if book_rows:
+            self.connection.executemany(UPSERT_BOOK, book_rows)
+        if transaction_rows:
+            self.connection.executemany(UPSERT_TRANSACTION, transaction_rows)
+        if deleted_transactions:
+            self.connection.executemany("DELETE FROM transactions WHERE transaction_id = ?", deleted_transactions)
+        if hold_rows:
+            self.connection.executemany(UPSERT_HOLD, hold_rows)
+        if deleted_holds:
+            self.connection.executemany("DELETE FROM holds WHERE hold_key = ?", deleted_holds)
+
+    def save_all(self, books: Dict[str, Dict], transactions: Dict[str, Dict], holds: Dict[str, Dict]):
+        """Write every book, transaction and hold and commit"""
+        self.save([("book", book_id, book) for book_id, book in books.items()])
+        self.save([("transaction", trans_id, trans) for trans_id, trans in transactions.items()])
+        self.save([("hold", key, hold) for key, hold in holds.items()])
+        self.commit()
+
+    def commit(self):
+        """Make all saved changes durable"""
+        self.connection.commit()
+
+    def checkpoint(self):
+        """Fold the SQLite WAL file back into the main database file"""
+        self.connection.commit()
+        self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """Commit and close the database"""
+        self.connection.commit()
+        self.connection.close()
+
+    # -------------------------------------------------------------------------
+    # Indexed queries the reports run instead of the in-memory indexes
+    # (they see changes saved but not yet committed on this connection)
+    # -------------------------------------------------------------------------
+
+    def student_loans(self, student_id):
+        """Get (transaction_id, transaction) pairs a student has borrowed, oldest first"""
+        return [(row[0], dict(zip(TRANSACTION_FIELDS, row[1:])))
+                for row in self.connection.execute(SELECT_STUDENT_LOANS, (student_id,))]
+
+    def overdue_loans(self, as_of_day, after, limit):
+        """Get up to limit (transaction_id, due_date, student_id, student_name, book title) rows due before a day
+        
+        Rows come in (due_date, transaction_id) order, starting after the
+        given (due_date, transaction_id) pair.
+        """
+        return self.connection.execute(SELECT_OVERDUE, (as_of_day, after[0], after[1], limit)).fetchall()
+
+    def overdue_totals(self, as_of_day):
+        """Get (overdue loans, total days overdue) for a day"""
+        return self.connection.execute(COUNT_OVERDUE, (as_of_day, as_of_day)).fetchone()
+
+    def popular_books(self, limit, genre=None):
+        """Get (book_id, title, checkout_count, genre) of the most borrowed books, optionally in one genre"""
+        if genre is None:
+            return self.connection.execute(SELECT_POPULAR, (limit,)).fetchall()
+        return self.connection.execute(SELECT_POPULAR_IN_GENRE, (genre, limit)).fetchall()
+
+    def count_books_above_checkouts(self, threshold, genre=None):
+        """Count books with more than threshold checkouts, optionally in one genre"""
+        if genre is None:
+            return self.connection.execute(COUNT_ABOVE_CHECKOUTS, (threshold,)).fetchone()[0]
+        return self.connection.execute(COUNT_ABOVE_CHECKOUTS_IN_GENRE, (genre, threshold)).fetchone()[0]
+
+    def student_activity(self):
+        """Get (student_id, name, total loans, active loans, total fines) per student, in first-seen order"""
+        return [(student_id, name, total, active, fines) for student_id, name, _, total, active, fines
+                in self.connection.execute(SELECT_STUDENT_ACTIVITY)]
+
+    # -------------------------------------------------------------------------
+    # Totals for the standalone report below (no need to load the data into memory)
+    # -------------------------------------------------------------------------
+
+    def inventory_totals(self):
+        """Get (titles, total copies, available copies)"""
+        titles, total, available = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(total_copies), 0), COALESCE(SUM(available_copies), 0) FROM books"
+        ).fetchone()
+        return titles, total, available
+
+    def transaction_totals(self, as_of_day, fine_per_day):
+        """Get (total, active, fines collected, overdue count, pending fines)"""
+        total, collected = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(fine), 0) FROM transactions").fetchone()
+        active = self.connection.execute(
+            "SELECT COUNT(*) FROM transactions WHERE status = 'borrowed'").fetchone()[0]
+        overdue, overdue_days = self.connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(? - due_date), 0) FROM transactions "
+            "WHERE status = 'borrowed' AND due_date < ?", (as_of_day, as_of_day)).fetchone()
+        return total, active, collected, overdue, overdue_days * fine_per_day
+
+
+if __name__ == "__main__":
+    # Quick report straight from the database, without loading it into memory
+    from library_manager_system import DATABASE_FILE, FINE_PER_DAY, get_current_day
+
+    database = SQLiteStorage(sys.argv[1] if len(sys.argv) > 1 else DATABASE_FILE)
+    titles, total, available = database.inventory_totals()
+    trans_total, active, collected, overdue, pending = database.transaction_totals(get_current_day(), FINE_PER_DAY)
+    print(f"Book Titles: {titles} | Copies: {total} | Available: {available}")
+    print(f"Transactions: {trans_total} | Active Loans: {active} | Overdue: {overdue}")
+    print(f"Fines Collected: ${collected:.2f} | Pending Fines: ${pending:.2f}")
+    database.close()
@@ -0,0 +1,387 @@
+# Campus Library Manager - Compact columnar transaction store
+#
+# Keeps every transaction as one row across typed arrays instead of one dict
+# per transaction. Book IDs, student IDs and student names are interned, the
+# status is a one-byte code and IDs of the usual "T001" form are located
+# through an array indexed by their number. TransactionStore behaves like the
+# old {transaction_id: {field: value}} dict; looking a transaction up returns
+# a TransactionRecord view whose reads and writes go straight to the columns.
+from array import array
+from collections.abc import MutableMapping
+from datetime import date
+from operator import index
+from typing import Dict, List
+
+FIELDS = ("book_id", "student_id", "student_name", "checkout_date",
+          "due_date", "return_date", "fine", "status")
+STATUSES = ("borrowed", "returned")
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+DELETED = 255  # status code of a row whose transaction has been removed
+NO_DATE = -1  # return_date of a loan that is still out
+
+# Per-row columns and string tables, as saved by binary snapshots
+ROW_COLUMNS = ("book_column", "student_column", "name_column", "checkout_column", "due_column",
+               "return_column", "fine_column", "status_column", "number_column")
+STRING_TABLES = ("book_ids", "student_ids", "student_names")
+
+
+class StringTable:
+    """Interns repeated strings as small integer codes"""
+
+    def __init__(self, values=None):
+        self.values: List[str] = list(values) if values else []
+        self.codes: Dict[str, int] = {} if not values else None  # Built on first use after a load
+
+    def code(self, value):
+        """Get the code for a string, adding it if it is new"""
+        if self.codes is None:
+            self.codes = {string: code for code, string in enumerate(self.values)}
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+def to_ordinal(value):
+    """Store dates as day ordinals, converting "%Y-%m-%d" strings on the way in"""
+    if value is None:
+        return NO_DATE
+    if isinstance(value, str):
+        return date.fromisoformat(value).toordinal()
+    return value
+
+
+class TransactionRecord(MutableMapping):
+    """Dict-like view of one stored transaction
+    
+    The view keeps its row, and finds it again by transaction ID if the
+    store's rows have moved since (after compact() or a reload).
+    """
+
+    __slots__ = ("store", "row", "transaction_id", "generation")
+
+    def __init__(self, store, row, transaction_id):
+        self.store = store
+        self.row = row
+        self.transaction_id = transaction_id
+        self.generation = store.generation
+
+    def relocate(self):
+        """Look the view's row up again after the store's rows have moved"""
+        row = self.store.find_row(self.transaction_id)
+        if row < 0:
+            raise KeyError(self.transaction_id)
+        self.row = row
+        self.generation = self.store.generation
+
+    def __getitem__(self, field):
+        if self.generation != self.store.generation:
+            self.relocate()
+        return self.store.get_field(self.row, field)
+
+    def __setitem__(self, field, value):
+        if self.generation != self.store.generation:
+            self.relocate()
+        self.store.set_field(self.row, field, value)
+
+    def __delitem__(self, field):
+        raise TypeError("Transaction fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TransactionStore(MutableMapping):
+    """Array-backed {transaction_id: transaction} mapping"""
+
+    def __init__(self, records=None):
+        self.generation = 0  # bumped whenever rows move, so record views look theirs up again
+        self.clear()
+        if records:
+            self.update(records)
+
+    def clear(self):
+        """Remove every transaction and release the column memory"""
+        self.book_ids = StringTable()
+        self.student_ids = StringTable()
+        self.student_names = StringTable()
+        self.book_column = array("i")
+        self.student_column = array("i")
+        self.name_column = array("i")
+        self.checkout_column = array("i")
+        self.due_column = array("i")
+        self.return_column = array("i")
+        self.fine_column = array("d")
+        self.status_column = array("B")
+        self.number_column = array("q")  # transaction number of each row, -1 if it has an unusual ID
+        self.row_by_number = array("i")  # transaction number -> row, -1 if unused
+        self.other_rows: Dict[str, int] = {}  # rows of IDs that do not look like "T001"
+        self.other_ids: Dict[int, str] = {}
+        self.count = 0
+        self.generation += 1
+
+    # -------------------------------------------------------------------------
+    # ID <-> row lookup
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def id_number(transaction_id):
+        """Get the number of an ID in canonical "T%03d" form, or None"""
+        if transaction_id[:1] != "T" or not transaction_id[1:].isdigit():
+            return None
+        number = int(transaction_id[1:])
+        return number if f"T{number:03d}" == transaction_id else None
+
+    def find_row(self, transaction_id):
+        """Get the row of a transaction, or -1"""
+        if not isinstance(transaction_id, str):
+            return -1
+        number = self.id_number(transaction_id)
+        if number is None:
+            return self.other_rows.get(transaction_id, -1)
+        if number < len(self.row_by_number):
+            return self.row_by_number[number]
+        return -1
+
+    def row_id(self, row):
+        """Get the transaction ID stored in a row"""
+        number = self.number_column[row]
+        return f"T{number:03d}" if number >= 0 else self.other_ids[row]
+
+    # -------------------------------------------------------------------------
+    # Field access
+    # -------------------------------------------------------------------------
+
+    def get_field(self, row, field):
+        """Decode one field of a row"""
+        if field == "status":
+            return STATUSES[self.status_column[row]]
+        if field == "book_id":
+            return self.book_ids.values[self.book_column[row]]
+        if field == "student_id":
+            return self.student_ids.values[self.student_column[row]]
+        if field == "student_name":
+            return self.student_names.values[self.name_column[row]]
+        if field == "due_date":
+            return self.due_column[row]
+        if field == "checkout_date":
+            return self.checkout_column[row]
+        if field == "return_date":
+            value = self.return_column[row]
+            return None if value == NO_DATE else value
+        if field == "fine":
+            return self.fine_column[row]
+        raise KeyError(field)
+
+    def encode_field(self, field, value):
+        """Get the column a field is kept in and the value's code there, raising if it cannot be stored"""
+        if field == "status":
+            return self.status_column, STATUS_CODES[value]
+        if field in ("book_id", "student_id", "student_name"):
+            if not isinstance(value, str):
+                raise TypeError(f"{field} must be a string, not {type(value).__name__}")
+            if field == "book_id":
+                return self.book_column, self.book_ids.code(value)
+            if field == "student_id":
+                return self.student_column, self.student_ids.code(value)
+            return self.name_column, self.student_names.code(value)
+        if field == "due_date":
+            return self.due_column, index(to_ordinal(value))
+        if field == "checkout_date":
+            return self.checkout_column, index(to_ordinal(value))
+        if field == "return_date":
+            return self.return_column, index(to_ordinal(value))
+        if field == "fine":
+            return self.fine_column, float(value)
+        raise KeyError(field)
+
+    def set_field(self, row, field, value):
+        """Encode one field of a row"""
+        column, code = self.encode_field(field, value)
+        column[row] = code
+
+    # -------------------------------------------------------------------------
+    # Mapping interface
+    # -------------------------------------------------------------------------
+
+    def __getitem__(self, transaction_id):
+        row = self.find_row(transaction_id)
+        if row < 0:
+            raise KeyError(transaction_id)
+        return TransactionRecord(self, row, transaction_id)
+
+    def __setitem__(self, transaction_id, record):
+        # Encode every field first, so a bad record leaves no half-written row behind
+        encoded = [self.encode_field(field, record[field]) for field in FIELDS]
+        row = self.find_row(transaction_id)
+        if row < 0:
+            row = self.append_row(transaction_id)
+        for column, code in encoded:
+            column[row] = code
+
+    def __delitem__(self, transaction_id):
+        row = self.find_row(transaction_id)
+        if row < 0:
+            raise KeyError(transaction_id)
+        self.status_column[row] = DELETED
+        self.fine_column[row] = 0.0
+        number = self.number_column[row]
+        if number >= 0:
+            self.row_by_number[number] = -1
+        else:
+            del self.other_rows[self.other_ids.pop(row)]
+        self.count -= 1
+
+    def __contains__(self, transaction_id):
+        return self.find_row(transaction_id) >= 0
+
+    def __iter__(self):
+        status_column = self.status_column
+        for row in range(len(status_column)):
+            if status_column[row] != DELETED:
+                yield self.row_id(row)
+
+    def __reversed__(self):
+        status_column = self.status_column
+        for row in range(len(status_column) - 1, -1, -1):
+            if status_column[row] != DELETED:
+                yield self.row_id(row)
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return f"TransactionStore({len(self)} transactions)"
+
+    def records(self):
+        """Iterate (transaction_id, record) pairs in insertion order without per-ID lookups"""
+        status_column = self.status_column
+        for row in range(len(status_column)):
+            if status_column[row] != DELETED:
+                transaction_id = self.row_id(row)
+                yield transaction_id, TransactionRecord(self, row, transaction_id)
+
+    def returned_before(self, day):
+        """Get the IDs of returned transactions with a return date before a day ordinal"""
+        returned = STATUS_CODES["returned"]
+        return [self.row_id(row)
+                for row, (status, return_day) in enumerate(zip(self.status_column, self.return_column))
+                if status == returned and return_day < day]
+
+    def loan_totals(self):
+        """Walk the columns once for rebuild_indexes, without a record view per row
+        
+        Returns ({student_id: [name, loans, open_loans, fines]} in the order
+        students first appear, [(due_date, transaction_id, student_id)] of the
+        loans still borrowed).
+        """
+        borrowed = STATUS_CODES["borrowed"]
+        totals: Dict[int, list] = {}
+        open_loans = []
+        student_ids = self.student_ids.values
+        rows = zip(self.status_column, self.student_column, self.name_column, self.due_column, self.fine_column)
+        for row, (status, student, name, due_day, fine) in enumerate(rows):
+            if status == DELETED:
+                continue
+            counts = totals.get(student)
+            if counts is None:
+                counts = totals[student] = [name, 0, 0, 0.0]
+            counts[1] += 1
+            counts[3] += fine
+            if status == borrowed:
+                counts[2] += 1
+                open_loans.append((due_day, self.row_id(row), student_ids[student]))
+        names = self.student_names.values
+        return {student_ids[student]: [names[counts[0]]] + counts[1:] for student, counts in totals.items()}, open_loans
+
+    def count_status(self, status):
+        """Count transactions with a status, straight from the status column"""
+        return self.status_column.count(STATUS_CODES[status])
+
+    def total_fines(self):
+        """Sum the fine column (deleted rows hold 0.0)"""
+        return sum(self.fine_column)
+
+    def append_row(self, transaction_id):
+        """Add an empty row for a new transaction ID"""
+        row = len(self.status_column)
+        for column in (self.book_column, self.student_column, self.name_column,
+                       self.checkout_column, self.due_column, self.return_column):
+            column.append(0)
+        self.fine_column.append(0.0)
+        self.status_column.append(0)
+
+        number = self.id_number(transaction_id)
+        if number is None:
+            self.number_column.append(-1)
+            self.other_rows[transaction_id] = row
+            self.other_ids[row] = transaction_id
+        else:
+            self.number_column.append(number)
+            if number >= len(self.row_by_number):
+                grown = max(number + 1, 2 * len(self.row_by_number))
+                self.row_by_number.extend([-1] * (grown - len(self.row_by_number)))
+            self.row_by_number[number] = row
+        self.count += 1
+        return row
+
+    # -------------------------------------------------------------------------
+    # Maintenance
+    # -------------------------------------------------------------------------
+
+    def compacted(self):
+        """Get a copy without deleted rows, leaving this store and its record views alone"""
+        if self.count == len(self.status_column):
+            return self
+        live = [row for row, status in enumerate(self.status_column) if status != DELETED]
+        copy = TransactionStore()
+        for name in STRING_TABLES:
+            setattr(copy, name, getattr(self, name))
+        columns = {}
+        for name in ROW_COLUMNS:
+            column = getattr(self, name)
+            columns[name] = array(column.typecode, map(column.__getitem__, live))
+        other_ids = {new_row: self.other_ids[row] for new_row, row in enumerate(live) if row in self.other_ids}
+        copy.load_columns(columns, None, other_ids)
+        return copy
+
+    def compact(self):
+        """Drop deleted rows in place, so scans stop paying for them"""
+        compacted = self.compacted()
+        if compacted is self:
+            return
+        columns = {name: getattr(compacted, name) for name in ROW_COLUMNS + ("row_by_number",)}
+        self.load_columns(columns, None, compacted.other_ids)
+
+    def load_columns(self, columns, tables, other_ids):
+        """Replace the contents with saved columns, string tables and unusual IDs
+        
+        columns maps each ROW_COLUMNS name (and optionally row_by_number) to an array,
+        tables maps each STRING_TABLES name to a list of strings (None keeps
+        the current tables) and other_ids maps rows to IDs not of "T001" form.
+        """
+        for name in ROW_COLUMNS:
+            setattr(self, name, columns[name])
+        if tables is not None:
+            for name in STRING_TABLES:
+                setattr(self, name, StringTable(tables[name]))
+        
+        if "row_by_number" in columns:
+            self.row_by_number = columns["row_by_number"]
+        else:
+            numbers = self.number_column
+            self.row_by_number = array("i", [-1]) * (max(numbers, default=-1) + 1)
+            for row, number in enumerate(numbers):
+                if number >= 0:
+                    self.row_by_number[number] = row
+        self.other_ids = dict(other_ids)
+        self.other_rows = {transaction_id: row for row, transaction_id in self.other_ids.items()}
+        self.count = len(self.status_column) - self.status_column.count(DELETED)
+        self.generation += 1
@@ -0,0 +1,43 @@
+# Shared fixtures: every test gets library_manager_system freshly loaded
+# (seed data only) with its data directory under the test's tmp_path.
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import library_manager_system  # noqa: E402
+
+
+def drop_storage(library):
+    """Close the open log/database without a snapshot, as a crash would leave them"""
+    if library.storage["log"] is not None:
+        library.storage["log"].close()
+        library.storage["log"] = None
+    if library.storage["db"] is not None:
+        library.storage["db"].connection.close()
+        library.storage["db"] = None
+    library.unlock_data_dir()
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    """library_manager_system reloaded with its data under tmp_path"""
+    monkeypatch.setenv("LIBRARY_DATA_DIR", str(tmp_path / "library_data"))
+    monkeypatch.delenv("LIBRARY_STORAGE", raising=False)
+    module = importlib.reload(library_manager_system)
+    yield module
+    drop_storage(module)
+
+
+@pytest.fixture
+def restart(library):
+    """Simulate a crash and restart: drop open storage, reload the module and open storage again"""
+    def crash_and_reload():
+        drop_storage(library)
+        importlib.reload(library)
+        library.open_storage()
+        return library
+    return crash_and_reload
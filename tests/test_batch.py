@@ -0,0 +1,36 @@
+def checkout(student_id, book_id):
+    return {"action": "checkout", "student_id": student_id, "student_name": "Batch Student", "book_id": book_id}
+
+
+def test_return_early_in_batch_frees_a_copy_for_a_later_checkout(library):
+    library.process_checkout("S100", "Ann Lee", "B002")
+    assert library.books["B002"]["available_copies"] == 0
+    loan = next(iter(library.student_open_loans["S100"]))
+
+    results = library.process_batch([{"action": "return", "transaction_id": loan}, checkout("S101", "B002")])
+    assert [result["ok"] for result in results] == [True, True]
+    assert library.books["B002"]["available_copies"] == 0
+    assert library.transactions[results[1]["transaction_id"]]['student_id'] == "S101"
+
+
+def test_batch_checkouts_respect_copies_and_loan_limit(library):
+    results = library.process_batch([checkout("S100", "B003") for _ in range(4)])
+    assert [result["ok"] for result in results] == [True, True, True, False]
+    assert library.get_student_active_loans("S100") == library.MAX_BOOKS_PER_STUDENT
+    assert library.books["B003"]["available_copies"] == 1
+    assert library.check_inventory_totals() == []
+
+
+def test_atomic_batch_applies_nothing_when_one_operation_fails(library):
+    results = library.process_batch([checkout("S100", "B003"), checkout("S100", "B999")], atomic=True)
+    assert [result["ok"] for result in results] == [False, False]
+    assert "Batch rejected" in results[0]["error"]
+    assert library.books["B003"]["available_copies"] == 4
+    assert library.get_student_active_loans("S100") == 0
+
+
+def test_batch_return_of_the_same_loan_twice(library):
+    results = library.process_batch([{"action": "return", "transaction_id": "T001"}] * 2 + [{"action": "renew"}])
+    assert [result["ok"] for result in results] == [True, False, False]
+    assert results[2]["error"] == "Unknown action: renew"
+    assert library.transactions["T001"]['status'] == "returned"
@@ -0,0 +1,48 @@
+import inspect
+import threading
+
+
+def test_report_is_reused_until_the_data_changes(library):
+    first = library.popular_books_data()
+    assert library.popular_books_data() is first
+    assert library.report_cache["hits"] == 1
+
+    library.process_checkout("S100", "Ann Lee", "B003")
+    rebuilt = library.popular_books_data()
+    assert rebuilt is not first
+    assert [book["book_id"] for book in rebuilt["books"]][:1] == ["B002"]
+
+
+def test_dated_report_is_rebuilt_the_next_day(library, monkeypatch):
+    first = library.transaction_summary_data()
+    assert library.transaction_summary_data() is first
+
+    today = library.get_current_day()
+    monkeypatch.setattr(library, "get_current_day", lambda: today + 1)
+    assert library.transaction_summary_data() is not first
+
+
+def test_counters_stay_exact_under_concurrent_use(library):
+    calls_per_thread = 200
+    start_together = threading.Barrier(8)
+
+    def reader():
+        start_together.wait()
+        for _ in range(calls_per_thread):
+            library.popular_books_data()
+
+    def writer():
+        start_together.wait()
+        for _ in range(calls_per_thread // 10):
+            ok, transaction_id = library.process_checkout("S100", "Ann Lee", "B003")
+            library.process_return(transaction_id)
+
+    threads = [threading.Thread(target=reader) for _ in range(7)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cache = library.report_cache
+    assert cache["hits"] + cache["misses"] == 7 * calls_per_thread
+    assert library.popular_books_data() == inspect.unwrap(library.popular_books_data)()
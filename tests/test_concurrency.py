@@ -0,0 +1,166 @@
+import random
+import sys
+import threading
+
+import pytest
+
+THREADS = 16
+OPERATIONS_PER_THREAD = 300
+COPIES = 5
+STUDENTS = 10
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads as often as possible to expose any unguarded check-then-act"""
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(old_interval)
+
+
+def run_threads(worker):
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def check_balances(library, book_id, checkouts, student_ids):
+    book = library.books[book_id]
+    open_loans = [tid for tid in checkouts if library.transactions[tid]['status'] == 'borrowed']
+    assert book['available_copies'] == COPIES - len(open_loans)
+    assert book['checkout_count'] == len(checkouts)
+    assert len(set(checkouts)) == len(checkouts), "duplicate transaction IDs were handed out"
+    assert library.check_inventory_totals() == []
+    for student_id in student_ids:
+        held = {tid for tid in open_loans if library.transactions[tid]['student_id'] == student_id}
+        assert len(held) <= library.MAX_BOOKS_PER_STUDENT
+        assert held == library.student_open_loans.get(student_id, set())
+
+
+def test_concurrent_checkouts_and_returns_stay_consistent(library, fast_switching):
+    library.open_storage()
+    book_id = "STRESS-TEST"
+    library.insert_books({book_id: library.new_book_record("Stress Test", "Nobody", "Test", COPIES, 2000)[0]})
+    student_ids = [f"STRESS{number:03d}" for number in range(STUDENTS)]
+    checkouts = []
+    problems = []
+    start_together = threading.Barrier(THREADS)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        my_loans = []
+        start_together.wait()
+        for _ in range(OPERATIONS_PER_THREAD):
+            student_id = rng.choice(student_ids)
+            if my_loans and rng.random() < 0.4:
+                success, result = library.process_return(my_loans.pop(rng.randrange(len(my_loans))))
+                if not success:
+                    problems.append(f"return failed: {result}")
+            else:
+                success, result = library.process_checkout(student_id, "Stress Student", book_id)
+                if success:
+                    my_loans.append(result)
+                    checkouts.append(result)
+            # These can only be seen mid-run if a check-then-update raced
+            if library.books[book_id]['available_copies'] < 0:
+                problems.append("copies oversold")
+            if library.get_student_active_loans(student_id) > library.MAX_BOOKS_PER_STUDENT:
+                problems.append(f"{student_id} went over the loan limit")
+
+    run_threads(worker)
+    assert problems == []
+    check_balances(library, book_id, checkouts, student_ids)
+
+
+def test_concurrent_batches_and_single_checkouts_stay_consistent(library, fast_switching):
+    library.open_storage()
+    book_id = "STRESS-TEST"
+    library.insert_books({book_id: library.new_book_record("Stress Test", "Nobody", "Test", COPIES, 2000)[0]})
+    student_ids = [f"STRESS{number:03d}" for number in range(STUDENTS)]
+    checkouts = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(OPERATIONS_PER_THREAD // 10):
+            operations = [{"action": "checkout", "student_id": rng.choice(student_ids),
+                           "student_name": "Stress Student", "book_id": book_id} for _ in range(3)]
+            results = library.process_batch(operations, atomic=rng.random() < 0.5)
+            taken = [result["transaction_id"] for result in results if result["ok"]]
+            success, single = library.process_checkout(rng.choice(student_ids), "Stress Student", book_id)
+            if success:
+                taken.append(single)
+            with lock:
+                checkouts.extend(taken)
+            returns = library.process_batch([{"action": "return", "transaction_id": tid} for tid in taken])
+            assert all(result["ok"] for result in returns)
+
+    run_threads(worker)
+    check_balances(library, book_id, checkouts, student_ids)
+    assert library.books[book_id]['available_copies'] == COPIES
+
+
+def test_reports_read_safely_while_threads_add_books_and_students(library, fast_switching):
+    library.open_storage()
+    library.insert_books({"STRESS-TEST": library.new_book_record("Stress Test", "Nobody", "Test", 10 ** 6, 2000)[0]})
+    done = threading.Event()
+    errors = []
+
+    def writer():
+        for number in range(OPERATIONS_PER_THREAD):
+            library.process_add_book(f"NEW{number:04d}", "New Book", "Somebody", "Test", 1, 2000)
+            library.process_checkout(f"NEW{number:04d}", "New Student", "STRESS-TEST")
+        done.set()
+
+    def reader():
+        # The menu calls these without taking any lock of its own
+        try:
+            while not done.is_set():
+                library.student_activity_data()
+                library.student_stats_page()
+                library.inventory_report_data()
+                library.popular_books_data()
+                library.system_status_data()
+        except RuntimeError as error:
+            errors.append(error)
+            done.set()
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_log_fsync_runs_outside_the_shared_lock(library, monkeypatch):
+    library.open_storage()
+    real_fsync = library.os.fsync
+    lock_held = []
+
+    def fsync(fd):
+        free = []
+
+        def probe():
+            if library.shared_lock.acquire(blocking=False):
+                library.shared_lock.release()
+                free.append(True)
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        thread.join()
+        lock_held.append(not free)
+        real_fsync(fd)
+
+    library.process_return(library.process_checkout("S101", "Bo Chen", "B003")[1])  # reserve the first ID block
+
+    monkeypatch.setattr(library.os, "fsync", fsync)
+    # Enough checkouts to run through more than one block of transaction IDs
+    for _ in range(library.TRANSACTION_ID_BLOCK_SIZE + 10):
+        ok, transaction_id = library.process_checkout("S100", "Ann Lee", "B003")
+        assert ok
+        assert library.process_return(transaction_id)[0]
+    assert lock_held and not any(lock_held)
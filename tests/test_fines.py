@@ -0,0 +1,44 @@
+import pytest
+
+
+def make_overdue_loans(library, monkeypatch):
+    """Check out loans on different days, then move the clock well past their due dates"""
+    today = library.get_current_day()
+    for number, book_id in enumerate(("B001", "B001", "B003", "B003")):
+        monkeypatch.setattr(library, "get_current_day", lambda: today + 3 * number)
+        assert library.process_checkout(f"S{number:03d}", "Late Student", book_id)[0]
+    monkeypatch.setattr(library, "get_current_day", lambda: today + 20)
+    return today + 20
+
+
+def expected_days(library, as_of_day):
+    return sorted(as_of_day - trans['due_date'] for trans in library.transactions.values()
+                  if trans['status'] == 'borrowed' and trans['due_date'] < as_of_day)
+
+
+def test_overdue_days_without_numpy(library, monkeypatch):
+    as_of_day = make_overdue_loans(library, monkeypatch)
+    monkeypatch.setattr(library, "np", None)
+    days = library.overdue_days(as_of_day)
+    assert sorted(days) == expected_days(library, as_of_day)
+    assert library.calculate_pending_fines(as_of_day) == sum(days) * library.FINE_PER_DAY
+
+
+def test_due_days_follow_the_loan_index(library, monkeypatch):
+    make_overdue_loans(library, monkeypatch)
+    assert library.process_return(library.loans_by_due_date[1][1])[0]
+    assert list(library.loan_due_days) == [due_day for due_day, _ in library.loans_by_due_date]
+    library.rebuild_indexes()
+    assert list(library.loan_due_days) == [due_day for due_day, _ in library.loans_by_due_date]
+
+
+def test_numpy_assessment_matches_plain_python(library, monkeypatch):
+    np = pytest.importorskip("numpy")
+    as_of_day = make_overdue_loans(library, monkeypatch)
+    vectorized = library.assess_fines(as_of_day)
+    days = library.overdue_days(as_of_day)
+    assert days.dtype == np.int64
+    assert sorted(days.tolist()) == expected_days(library, as_of_day)
+
+    monkeypatch.setattr(library, "np", None)
+    assert library.assess_fines(as_of_day) == vectorized
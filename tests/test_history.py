@@ -0,0 +1,43 @@
+import threading
+
+import library_history
+
+
+def make_history(library):
+    for number in range(30):
+        student_id = f"S{number % 7:03d}"
+        ok, transaction_id = library.process_checkout(student_id, f"Student {number % 7}", "B001")
+        if ok and number % 3:
+            library.process_return(transaction_id)
+    library.process_return("T001")  # long overdue, so it carries a fine
+
+
+def test_parallel_recount_matches_running_totals(library, monkeypatch):
+    make_history(library)
+    monkeypatch.setattr(library_history, "MIN_PARTITION_ROWS", 1)
+    monkeypatch.setattr(library_history.os, "cpu_count", lambda: 3)
+
+    assert library.student_activity_data(3) == library.student_activity_data()
+    recounted = library.transaction_summary_data(3)
+    running = library.transaction_summary_data()
+    for field in ("total_transactions", "active_loans", "completed_returns", "total_fines"):
+        assert recounted[field] == running[field]
+
+
+def test_recount_does_not_hold_the_shared_lock_while_counting(library, monkeypatch):
+    make_history(library)
+    seen = []
+
+    def aggregate_while_checking(partitions):
+        def try_lock():
+            seen.append(library.shared_lock.acquire(timeout=5))
+            library.shared_lock.release()
+
+        other = threading.Thread(target=try_lock)
+        other.start()
+        other.join()
+        return library_history.aggregate_partitions(partitions)
+
+    monkeypatch.setattr(library, "aggregate_partitions", aggregate_while_checking)
+    library.history_totals(2)
+    assert seen == [True]
@@ -0,0 +1,92 @@
+import threading
+
+
+def lend_out(library, book_id):
+    """Check out every free copy of a book; returns the transaction IDs"""
+    loans = []
+    for number in range(library.books[book_id]["available_copies"]):
+        ok, transaction_id = library.process_checkout(f"L{number:03d}", "Lender", book_id)
+        assert ok
+        loans.append(transaction_id)
+    return loans
+
+
+def test_returned_copy_goes_to_the_first_holder(library):
+    loans = lend_out(library, "B002")
+    assert library.process_place_hold("S200", "Ana", "B002") == (True, 1)
+    assert library.process_place_hold("S201", "Ben", "B002") == (True, 2)
+
+    library.process_return(loans[0])
+    assert library.holds["B002:S200"]["status"] == "ready"
+    assert library.process_place_hold("S202", "Cy", "B002") == (True, 2)
+    assert not library.process_checkout("S201", "Ben", "B002")[0]
+    assert library.process_checkout("S200", "Ana", "B002")[0]
+    assert "B002:S200" not in library.holds
+
+
+def test_set_aside_copies_count_toward_the_loan_limit(library):
+    loans = lend_out(library, "B002")
+    library.process_place_hold("S200", "Ana", "B002")
+    library.process_return(loans[0])
+    for _ in range(library.MAX_BOOKS_PER_STUDENT - 1):
+        assert library.process_checkout("S200", "Ana", "B003")[0]
+
+    ok, error = library.process_checkout("S200", "Ana", "B003")
+    assert not ok and "maximum loan limit" in error
+    # The copy set aside for them is theirs to take
+    assert library.process_checkout("S200", "Ana", "B002")[0]
+
+
+def test_batch_filling_a_hold_frees_its_slot(library):
+    loans = lend_out(library, "B002")
+    library.process_place_hold("S200", "Ana", "B002")
+    library.process_return(loans[0])
+    library.process_checkout("S200", "Ana", "B003")
+
+    operations = [{"action": "checkout", "student_id": "S200", "student_name": "Ana", "book_id": book_id}
+                  for book_id in ("B002", "B001", "B001")]
+    results = library.process_batch(operations)
+    assert [result["ok"] for result in results] == [True, True, False]
+    assert library.get_student_active_loans("S200") == library.MAX_BOOKS_PER_STUDENT
+
+
+def test_hold_rejected_for_a_book_already_on_loan(library):
+    lend_out(library, "B002")
+    ok, error = library.process_place_hold("L000", "Lender", "B002")
+    assert not ok and "already has this book on loan" in error
+
+
+def test_expired_pickup_passes_the_copy_on(library, monkeypatch):
+    loans = lend_out(library, "B002")
+    library.process_place_hold("S200", "Ana", "B002")
+    library.process_place_hold("S201", "Ben", "B002")
+    library.process_return(loans[0])
+
+    today = library.get_current_day()
+    monkeypatch.setattr(library, "get_current_day", lambda: today + library.HOLD_PICKUP_DAYS + 1)
+    library.expire_due_holds()
+    assert "B002:S200" not in library.holds
+    assert library.holds["B002:S201"]["status"] == "ready"
+    assert library.held_copies("B002") == 1
+
+
+def test_expiry_dispatch_never_oversells_against_checkouts(library, monkeypatch):
+    # Holders near their limit race their own checkouts against the expiry of an earlier pickup
+    loans = lend_out(library, "B002")
+    library.process_place_hold("S200", "Ana", "B002")
+    library.process_place_hold("S201", "Ben", "B002")
+    library.process_return(loans[0])
+    library.process_checkout("S201", "Ben", "B003")
+
+    today = library.get_current_day()
+    monkeypatch.setattr(library, "get_current_day", lambda: today + library.HOLD_PICKUP_DAYS + 1)
+    threads = [threading.Thread(target=library.process_checkout, args=("S201", "Ben", "B003")) for _ in range(4)]
+    threads.append(threading.Thread(target=library.expire_due_holds))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    committed = library.get_student_active_loans("S201") + library.student_ready_holds.get("S201", 0)
+    assert committed <= library.MAX_BOOKS_PER_STUDENT
+    assert library.books["B002"]["available_copies"] >= library.held_copies("B002")
@@ -0,0 +1,31 @@
+import json
+
+
+def test_csv_import_with_byte_order_mark(library, tmp_path):
+    path = tmp_path / "books.csv"
+    path.write_text("book_id,title,author,genre,total_copies,publication_year\n"
+                    "B100,Go Deep,Ida Ng,Technology,2,2020\n"
+                    "B101,Broken,No One,Fiction,zero,2020\n", encoding="utf-8-sig")
+
+    report = library.import_books(str(path))
+    assert (report["imported"], report["rejected"]) == (1, 1)
+    assert report["errors"][0][0] == 3
+    assert library.books["B100"]["available_copies"] == 2
+
+
+def test_jsonl_import_rejects_duplicates(library, tmp_path):
+    path = tmp_path / "books.jsonl"
+    rows = [{"book_id": book_id, "title": "Again", "author": "Al", "genre": "Art",
+             "total_copies": 1, "publication_year": 2001} for book_id in ("B001", "B200", "B200")]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+    report = library.import_books(str(path))
+    assert (report["imported"], report["rejected"]) == (1, 2)
+    assert library.books["B001"]["title"] == "Python Programming"
+
+
+def test_short_queries_use_the_gram_index(library):
+    library.process_add_book("B300", "Go", "Ida Ng", "Technology", 1, 2020)
+    assert {book_id for book_id, _ in library.find_books(title="go")} == {"B300"}
+    assert {book_id for book_id, _ in library.find_books(author="ng")} == {"B300"}
+    assert {book_id for book_id, _ in library.find_books(title="w")} == {"B003"}
@@ -0,0 +1,37 @@
+import threading
+
+
+def test_unwritable_metrics_file_does_not_fail_a_checkout(library, tmp_path, monkeypatch, capsys):
+    library.open_storage()
+    (tmp_path / "not_a_dir").write_text("")
+    monkeypatch.setattr(library, "METRICS_FILE", str(tmp_path / "not_a_dir" / "metrics.prom"))
+    monkeypatch.setattr(library, "METRICS_WRITE_INTERVAL", 0)
+
+    ok, transaction_id = library.process_checkout("S100", "Ann Lee", "B003")
+    assert ok
+    assert library.transactions[transaction_id]['status'] == "borrowed"
+    assert library.performance["process_checkout"]["errors"] == 0
+    assert "Metrics file write failed" in capsys.readouterr().err
+
+
+def test_concurrent_metrics_writes_leave_a_complete_file(library, monkeypatch):
+    library.open_storage()
+    monkeypatch.setattr(library, "METRICS_WRITE_INTERVAL", 0)
+    failures = []
+
+    def worker():
+        for _ in range(50):
+            library.find_books(title="python")
+            if not library.write_metrics_file():
+                failures.append("write failed")
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert failures == []
+    with open(library.METRICS_FILE) as f:
+        text = f.read()
+    assert text.endswith("\n")
+    assert 'library_operation_calls_total{operation="find_books"}' in text
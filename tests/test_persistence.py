@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+
+
+def test_changes_survive_a_crash(library, restart):
+    library.open_storage()
+    ok, transaction_id = library.process_checkout("S100", "Ann Lee", "B003")
+    assert ok
+
+    library = restart()
+    assert library.transactions[transaction_id]['student_id'] == "S100"
+    assert library.books["B003"]["available_copies"] == 3
+    assert library.get_student_active_loans("S100") == 1
+
+
+def test_torn_log_tail_does_not_swallow_later_writes(library, restart):
+    library.open_storage()
+    ok, first = library.process_checkout("S100", "Ann Lee", "B003")
+    assert ok
+
+    # Crash part-way through writing the next record
+    library.storage["log"].close()
+    library.storage["log"] = None
+    with open(library.LOG_FILE, "a") as f:
+        f.write('{"seq": 99, "kind": "transac')
+
+    library = restart()
+    assert first in library.transactions
+    ok, second = library.process_checkout("S101", "Bo Chen", "B003")
+    assert ok
+
+    library = restart()
+    assert first in library.transactions
+    assert second in library.transactions
+    assert library.books["B003"]["available_copies"] == 2
+
+
+def test_snapshot_replaces_log(library, restart):
+    library.open_storage()
+    library.process_add_book("B900", "Snapshot Book", "Sam Page", "Fiction", 2, 2020)
+    library.close_storage()
+
+    library = restart()
+    assert library.books["B900"]["title"] == "Snapshot Book"
+    assert [book_id for book_id, _ in library.find_books(title="snapshot")] == ["B900"]
+
+
+def test_sqlite_backend_round_trip(library, restart, monkeypatch):
+    monkeypatch.setattr(library, "STORAGE_BACKEND", "sqlite")
+    library.open_storage()
+    ok, transaction_id = library.process_checkout("S100", "Ann Lee", "B001")
+    assert ok
+
+    monkeypatch.setenv("LIBRARY_STORAGE", "sqlite")
+    library = restart()
+    assert library.storage["db"] is not None
+    assert library.transactions[transaction_id]['book_id'] == "B001"
+
+
+def test_torn_archive_segment_does_not_hide_later_runs(library, monkeypatch):
+    library.open_storage()
+    today = library.get_current_day()
+    ok, first = library.process_checkout("S100", "Ann Lee", "B003")
+    assert ok and library.process_return(first)[0]
+    library.archive_transactions(0, today + 1)
+
+    # Crash part-way through appending the next member
+    with open(library.archive_segment_file(today + 1), "ab") as f:
+        f.write(b"\x1f\x8b\x08\x00torn")
+
+    monkeypatch.setattr(library, "get_current_day", lambda: today + 1)
+    ok, second = library.process_checkout("S101", "Bo Chen", "B003")
+    assert ok and library.process_return(second)[0]
+    assert library.archive_transactions(0, today + 2) == 1
+    assert len(library.transactions.status_column) == len(library.transactions)
+
+    archived = [transaction_id for transaction_id, _ in library.iter_archive()]
+    assert first in archived
+    assert second in archived
+
+
+def test_second_process_cannot_open_the_same_data(library, tmp_path):
+    library.open_storage()
+    script = ("import library_manager_system as library\n"
+              "try:\n    library.open_storage()\nexcept RuntimeError:\n    print('locked')\n")
+    env = dict(os.environ, LIBRARY_DATA_DIR=library.DATA_DIR)
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(library.__file__), env=env,
+                            capture_output=True, text=True)
+    assert result.stdout.strip() == "locked"
+
+    library.close_storage()
+    result = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(library.__file__), env=env,
+                            capture_output=True, text=True)
+    assert result.returncode == 0 and result.stdout.strip() == ""
+
+
+def test_transaction_ids_continue_past_existing_ones_without_the_id_file(library, restart):
+    library.open_storage()
+    ok, transaction_id = library.process_checkout("S100", "Ann Lee", "B003")
+    assert ok
+    library.close_storage()
+    os.remove(library.TRANSACTION_ID_FILE)
+
+    library = restart()
+    ok, next_id = library.process_checkout("S101", "Bo Chen", "B003")
+    assert ok
+    assert library.transaction_number(next_id) == library.transaction_number(transaction_id) + 1
@@ -0,0 +1,44 @@
+import csv
+import json
+
+
+def add_books(library, count):
+    new_books = {f"X{number:03d}": library.new_book_record(f"Extra {number}", "Ed Extra", "Fiction", 1, 2020)[0]
+                 for number in range(count)}
+    library.insert_books(new_books)
+
+
+def test_export_writes_every_row_once(library, tmp_path, monkeypatch):
+    monkeypatch.setattr(library, "EXPORT_PAGE_SIZE", 2)
+    add_books(library, 5)  # 8 books: an exact multiple of the page size
+
+    path = tmp_path / "books.csv"
+    assert library.export_rows(library.book_rows, str(path), library.BOOK_COLUMNS) == 8
+    with open(path, newline="") as f:
+        exported = [row["book_id"] for row in csv.DictReader(f)]
+    assert exported == list(library.books)
+
+
+def test_paused_walk_picks_up_books_added_meanwhile(library):
+    rows = library.book_rows()
+    first = [next(rows)[1]["book_id"] for _ in range(2)]
+    add_books(library, 2)
+    rest = [row["book_id"] for _, row in rows]
+    assert first + rest == list(library.books)
+
+
+def test_overdue_export_survives_returns_between_pages(library, tmp_path, monkeypatch):
+    today = library.get_current_day()
+    loans = [library.process_checkout(f"S{number:03d}", "Late Student", "B003")[1] for number in range(3)]
+    monkeypatch.setattr(library, "get_current_day", lambda: today + library.LOAN_PERIOD_DAYS + 5)
+
+    rows = library.overdue_rows()
+    first = next(rows)[1]["transaction_id"]
+    library.process_return(loans[0])
+    rest = [row["transaction_id"] for _, row in rows]
+    assert [first] + rest == ["T001"] + loans[1:]
+
+    path = tmp_path / "overdue.jsonl"
+    assert library.export_rows(library.overdue_rows, str(path), library.OVERDUE_COLUMNS) == 3
+    with open(path) as f:
+        assert [json.loads(line)["transaction_id"] for line in f] == ["T001"] + loans[1:]
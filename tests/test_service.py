@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+import time
+
+import library_service
+
+
+def request(method, target, body=None):
+    return library_service.handle_request(method, target, json.dumps(body).encode() if body is not None else b"")
+
+
+def test_popular_books_limit_must_be_positive(library):
+    status, payload = request("GET", "/reports/popular?limit=0")
+    assert status == 400
+    assert "limit" in payload["error"]
+
+    status, payload = request("GET", "/reports/popular?limit=1")
+    assert status == 200
+    assert [book["book_id"] for book in payload["books"]] == ["B002"]
+
+
+def test_popular_books_genre_ignores_case_and_spaces(library):
+    status, payload = request("GET", "/reports/popular?genre=%20technology%20")
+    assert status == 200
+    assert [book["book_id"] for book in payload["books"]] == ["B001", "B003"]
+
+
+def test_batch_items_must_be_objects(library):
+    status, payload = request("POST", "/batch", {"operations": ["checkout", 3]})
+    assert status == 400
+    status, payload = request("POST", "/batch", {"operations": {"action": "checkout"}})
+    assert status == 400
+
+    operation = {"action": "checkout", "student_id": "S100", "student_name": "Ann Lee", "book_id": "B003"}
+    status, payload = request("POST", "/batch", {"operations": [operation]})
+    assert status == 200
+    assert payload["results"][0]["ok"]
+
+
+def test_slow_handler_does_not_block_other_connections(library, monkeypatch):
+    release = threading.Event()
+    original = library_service.handle_request
+
+    def handle_request(method, target, body):
+        if target == "/slow":
+            release.wait(5)
+            return 200, {}
+        return original(method, target, body)
+
+    monkeypatch.setattr(library_service, "handle_request", handle_request)
+
+    async def fetch(port, target):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {target} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await reader.readline()
+        writer.close()
+        return int(status_line.split()[1])
+
+    async def scenario():
+        server = await asyncio.start_server(library_service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        started = time.perf_counter()
+        slow = asyncio.ensure_future(fetch(port, "/slow"))
+        await asyncio.sleep(0.05)
+        fast_status = await asyncio.wait_for(fetch(port, "/books/B001"), 2)
+        waited = time.perf_counter() - started
+        release.set()
+        slow_status = await slow
+        server.close()
+        await server.wait_closed()
+        return fast_status, slow_status, waited
+
+    fast_status, slow_status, waited = asyncio.run(scenario())
+    assert (fast_status, slow_status) == (200, 200)
+    assert waited < 1
+
+
+def test_book_update_coerces_text_fields(library):
+    library.open_storage()
+    status, payload = request("PUT", "/books/B001", {"title": 123, "genre": " Science "})
+    assert status == 200
+    assert library.books["B001"]["title"] == "123"
+    assert library.books["B001"]["genre"] == "Science"
+    assert [book_id for book_id, _ in library.find_books(title="123")] == ["B001"]
+    assert "B001" in library.top_books(10, genre="science")
+    library.write_snapshot()
@@ -0,0 +1,63 @@
+import pytest
+
+
+@pytest.fixture
+def sqlite_library(library, monkeypatch):
+    """Library on the SQLite backend with loans checked out on different days, some since returned"""
+    monkeypatch.setattr(library, "STORAGE_BACKEND", "sqlite")
+    library.open_storage()
+    today = library.get_current_day()
+    for number, book_id in enumerate(("B001", "B001", "B003", "B003", "B002")):
+        monkeypatch.setattr(library, "get_current_day", lambda: today + 3 * number)
+        assert library.process_checkout(f"S{number % 3:03d}", f"Student {number % 3}", book_id)[0]
+    monkeypatch.setattr(library, "get_current_day", lambda: today + 20)
+    assert library.process_return(library.loans_by_due_date[0][1])[0]
+    return library
+
+
+def from_database_and_memory(library, build):
+    """Build a report from the database's queries, then again from the in-memory indexes"""
+    with library.shared_lock:
+        library.data_changed()
+    from_database = build()
+    database, library.storage["db"] = library.storage["db"], None
+    try:
+        with library.shared_lock:
+            library.data_changed()
+        from_memory = build()
+    finally:
+        library.storage["db"] = database
+    return from_database, from_memory
+
+
+@pytest.mark.parametrize("build", [
+    lambda library: library.get_student_open_transactions("S001"),
+    lambda library: library.overdue_books_data(page_size=2),
+    lambda library: library.overdue_books_data("0:", page_size=100),
+    lambda library: library.popular_books_data(2),
+    lambda library: library.popular_books_data(5, " technology "),
+    lambda library: library.student_activity_data(),
+    lambda library: library.student_stats_page("total_fines", page_size=2),
+])
+def test_database_reports_match_memory(sqlite_library, build):
+    from_database, from_memory = from_database_and_memory(sqlite_library, lambda: build(sqlite_library))
+    if isinstance(from_database, list):
+        from_database = [(tid, dict(trans)) for tid, trans in from_database]
+        from_memory = [(tid, dict(trans)) for tid, trans in from_memory]
+    assert from_database == from_memory
+
+
+def test_reports_use_the_indexes(sqlite_library):
+    connection = sqlite_library.storage["db"].connection
+    plans = {
+        "idx_transactions_student": ("SELECT * FROM transactions WHERE student_id = ? AND status = 'borrowed'",
+                                     ("S001",)),
+        "idx_transactions_status_due": ("SELECT * FROM transactions WHERE status = 'borrowed' AND due_date < ?", (0,)),
+        "idx_transactions_book": ("SELECT * FROM transactions WHERE book_id = ?", ("B001",)),
+        "idx_books_author": ("SELECT * FROM books WHERE author = ?", ("Nobody",)),
+        "idx_books_genre": ("SELECT * FROM books WHERE genre = ? COLLATE NOCASE ORDER BY checkout_count DESC",
+                            ("fiction",)),
+    }
+    for index_name, (query, parameters) in plans.items():
+        plan = " ".join(row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + query, parameters))
+        assert index_name in plan
@@ -0,0 +1,57 @@
+import pytest
+
+from library_store import TransactionStore
+
+LOAN = {"book_id": "B001", "student_id": "S001", "student_name": "Alice Johnson", "checkout_date": "2024-01-15",
+        "due_date": "2024-01-29", "return_date": None, "fine": 0.0, "status": "borrowed"}
+
+
+@pytest.mark.parametrize("field, value", [("status", "lost"), ("due_date", "someday"),
+                                          ("fine", "free"), ("student_id", None), ("checkout_date", 1.5)])
+def test_bad_record_leaves_no_row_behind(field, value):
+    store = TransactionStore({"T001": LOAN})
+    with pytest.raises((KeyError, ValueError, TypeError)):
+        store["T002"] = dict(LOAN, **{field: value})
+    assert "T002" not in store
+    assert len(store) == 1
+    assert len(store.status_column) == 1
+    assert store.count_status("borrowed") == 1
+
+
+def test_bad_update_keeps_the_old_record():
+    store = TransactionStore({"T001": LOAN})
+    with pytest.raises(KeyError):
+        store["T001"] = dict(LOAN, student_id="S999", status="lost")
+    assert dict(store["T001"])["student_id"] == "S001"
+
+
+def test_deleted_rows_are_dropped_from_a_compacted_copy():
+    store = TransactionStore({"T001": LOAN, "T002": dict(LOAN, status="returned", return_date="2024-01-20")})
+    del store["T001"]
+    compacted = store.compacted()
+    assert list(compacted) == ["T002"]
+    assert len(compacted.status_column) == 1
+    assert compacted["T002"]["return_date"] == store["T002"]["return_date"]
+
+
+def test_loan_totals_skip_deleted_rows():
+    returned = dict(LOAN, status="returned", return_date="2024-01-31", fine=4.0)
+    store = TransactionStore({"T001": returned, "T002": LOAN, "T003": dict(LOAN, student_id="S002", student_name="Bob"),
+                              "T004": dict(returned, student_name="Alice J.")})
+    del store["T003"]
+    students, open_loans = store.loan_totals()
+    assert students == {"S001": ["Alice Johnson", 3, 1, 8.0]}
+    assert open_loans == [(store["T002"]["due_date"], "T002", "S001")]
+
+
+def test_compact_in_place_keeps_record_views_working():
+    store = TransactionStore({"T001": LOAN, "T002": dict(LOAN, student_id="S002"), "LEGACY-1": LOAN})
+    view = store["T002"]
+    del store["T001"]
+    store.compact()
+    assert len(store.status_column) == 2
+    assert list(store) == ["T002", "LEGACY-1"]
+    assert view["student_id"] == "S002"
+    view["fine"] = 3.0
+    assert store["T002"]["fine"] == 3.0
+    assert store["LEGACY-1"]["student_id"] == "S001"